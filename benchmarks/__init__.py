@@ -0,0 +1,10 @@
+"""
+Micro-benchmarks for the matcher and pantry-diff hot paths.
+
+    python -m benchmarks.bench_matcher            # run and compare with baselines.json
+    python -m benchmarks.bench_matcher --help
+
+Everything runs against synthetic households (benchmarks.synthetic) served by
+an in-memory fake of the Supabase client (benchmarks.fake_supabase); no
+network or database is needed.
+"""
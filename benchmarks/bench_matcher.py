@@ -0,0 +1,204 @@
+"""
+Benchmarks names_match, find_match, check_recipe_against_pantry and
+deduct_from_pantry on a synthetic household and compares the results with
+stored baselines.
+
+    python -m benchmarks.bench_matcher                      # compare with benchmarks/baselines.json
+    python -m benchmarks.bench_matcher --pantry 1000 --recipes 200
+    python -m benchmarks.bench_matcher --save-baseline      # record this machine's numbers
+
+Each case reports ops/sec, mean and p95 latency, and Supabase round trips
+per op (counted by the fake client). A case regresses when its ops/sec drops
+more than --tolerance below the baseline or it makes more round trips than
+the baseline; the run then exits 1. It also exits 1 if NameBlocks
+candidate pruning misses any pair the brute-force fuzzy scan accepts
+(recall below 1.0). Baselines only apply to runs with the
+same household sizes, and ops/sec only compares fairly on the machine that
+recorded them; round trips compare anywhere.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# The snapshot lives in memory for the run, and reads only re-sync after a
+# write marks the household stale, as with a live cache_events subscription.
+os.environ.setdefault("PANTRY_SNAPSHOT_PATH", ":memory:")
+os.environ.setdefault("PANTRY_SNAPSHOT_MAX_AGE", "3600")
+
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.synthetic import make_household
+from utils import ingredient_aliases, ingredient_matcher, pantry_snapshot, supabase_client
+from utils.ingredient_matcher import (
+    bump_pantry_version,
+    check_recipe_against_pantry,
+    deduct_from_pantry,
+    find_match,
+    get_substitution_index,
+    names_match,
+    normalize_name,
+)
+from utils.match_blocking import NameBlocks, measure_recall
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def _use_client(fake: FakeSupabase) -> None:
+    """Points every module that talks to Supabase at the fake."""
+    for module in (ingredient_matcher, pantry_snapshot, supabase_client):
+        module.get_client = lambda: fake
+
+
+def _measure(op, fake: FakeSupabase, min_seconds: float, min_ops: int) -> dict:
+    op(0)  # warm caches and the snapshot; not timed
+    times = []
+    trips_before = fake.round_trips
+    started = time.perf_counter()
+    i = 1
+    while len(times) < min_ops or time.perf_counter() - started < min_seconds:
+        t = time.perf_counter()
+        op(i)
+        times.append(time.perf_counter() - t)
+        i += 1
+    total = sum(times)
+    return {
+        "ops": len(times),
+        "ops_per_sec": round(len(times) / total, 1),
+        "mean_us": round(total / len(times) * 1e6, 1),
+        "p95_us": round(sorted(times)[int(0.95 * (len(times) - 1))] * 1e6, 1),
+        "round_trips": round((fake.round_trips - trips_before) / len(times), 2),
+    }
+
+
+def run(config: dict, min_seconds: float = 0.5, min_ops: int = 20) -> dict:
+    """Runs every case against a fresh household built from config. Returns {case: stats}."""
+    hh = make_household(**config)
+    fake = FakeSupabase(hh.tables)
+    _use_client(fake)
+    subs = get_substitution_index(hh.id)
+    aliases = ingredient_aliases.get_alias_index()
+
+    needles = hh.ingredient_names
+    pairs = [(needles[i % len(needles)], hh.pantry_names[i * 7 % len(hh.pantry_names)]) for i in range(1000)]
+    blocks = NameBlocks([normalize_name(n) for n in hh.pantry_names])
+    recipes = hh.recipe_ids
+
+    def cold_check(i):
+        bump_pantry_version(hh.id)
+        check_recipe_against_pantry(recipes[i % len(recipes)], hh.id)
+
+    cases = {
+        "names_match": lambda i: names_match(*pairs[i % len(pairs)], subs, aliases),
+        "find_match": lambda i: find_match(needles[i % len(needles)], hh.pantry_names, subs, aliases),
+        "find_match (blocked)": lambda i: find_match(
+            needles[i % len(needles)], hh.pantry_names, subs, aliases, blocks
+        ),
+        "check_recipe_against_pantry (warm)": lambda i: check_recipe_against_pantry(recipes[i % len(recipes)], hh.id),
+        "check_recipe_against_pantry (after write)": cold_check,
+        "deduct_from_pantry": lambda i: deduct_from_pantry(
+            recipes[i % len(recipes)], hh.id, servings=1, idempotency_key=f"bench-{i}"
+        ),
+    }
+    return {name: _measure(op, fake, min_seconds, min_ops) for name, op in cases.items()}
+
+
+def blocking_recall(config: dict) -> dict:
+    """measure_recall() for the household's recipe ingredient names against its pantry."""
+    hh = make_household(**config)
+    return measure_recall(
+        sorted({normalize_name(n) for n in hh.ingredient_names}), [normalize_name(n) for n in hh.pantry_names]
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regression messages for results against baseline["cases"]; empty when nothing regressed."""
+    problems = []
+    for name, stats in results.items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        if stats["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            problems.append(
+                f"{name}: {stats['ops_per_sec']:.0f} ops/s vs baseline {base['ops_per_sec']:.0f}"
+                f" ({stats['ops_per_sec'] / base['ops_per_sec'] - 1:+.0%})"
+            )
+        if stats["round_trips"] > base["round_trips"] + 1e-9:
+            problems.append(f"{name}: {stats['round_trips']} round trips/op vs baseline {base['round_trips']}")
+    return problems
+
+
+def _print_table(results: dict, baseline: dict | None) -> None:
+    header = f"{'case':<44}{'ops/s':>12}{'mean µs':>12}{'p95 µs':>12}{'trips/op':>10}{'vs base':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, s in results.items():
+        base = (baseline or {}).get("cases", {}).get(name)
+        delta = f"{s['ops_per_sec'] / base['ops_per_sec'] - 1:+.0%}" if base else "-"
+        print(
+            f"{name:<44}{s['ops_per_sec']:>12,.0f}{s['mean_us']:>12,.1f}{s['p95_us']:>12,.1f}"
+            f"{s['round_trips']:>10}{delta:>10}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the matcher and pantry-diff hot paths.")
+    parser.add_argument("--pantry", type=int, default=200, help="pantry items (default 200)")
+    parser.add_argument("--substitutions", type=int, default=50, help="substitution pairs (default 50)")
+    parser.add_argument("--recipes", type=int, default=50, help="recipes (default 50)")
+    parser.add_argument("--ingredients", type=int, default=10, help="ingredients per recipe (default 10)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=0.5, help="minimum time per case (default 0.5)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed ops/sec drop (default 0.25)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    config = {
+        "pantry_items": args.pantry,
+        "substitution_pairs": args.substitutions,
+        "recipes": args.recipes,
+        "ingredients_per_recipe": args.ingredients,
+        "seed": args.seed,
+    }
+    results = run(config, args.seconds)
+    recall = blocking_recall(config)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"Baseline was recorded for {baseline.get('config')}; not comparing.", file=sys.stderr)
+            baseline = None
+
+    if args.json:
+        print(json.dumps({"config": config, "cases": results, "blocking_recall": recall}, indent=2))
+    else:
+        _print_table(results, baseline)
+        print(
+            f"\nblocking recall {recall['recall']:.3f} ({recall['found']}/{recall['pairs']} pairs,"
+            f" {recall['candidates_per_needle']:.1f} of {recall['names']} names scored per needle)"
+        )
+    if recall["recall"] < 1.0:
+        print(f"\nBlocking dropped {recall['pairs'] - recall['found']} matching pairs", file=sys.stderr)
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "cases": results}, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if baseline is not None:
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print("\nRegressions:\n  " + "\n  ".join(problems), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+"""
+In-memory stand-in for the Supabase client, enough for the matcher paths.
+
+FakeSupabase.table() supports the select / eq / gt / is_ / in_ / order / limit
+chains the utils modules build, and rpc() implements the RPCs they call
+(sync_changes, deduct_pantry_items, pantry_match_candidates) against the
+same in-memory tables. Every execute() counts as one round trip, so a
+benchmark can report how many requests a code path makes.
+"""
+
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from rapidfuzz.fuzz import ratio
+
+from utils.ingredient_aliases import tokenize
+
+
+@dataclass
+class FakeResponse:
+    data: list | dict | None
+
+
+class FakeQuery:
+    def __init__(self, client: FakeSupabase, table: str):
+        self._client = client
+        self._table = table
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def is_(self, column, value):
+        expected = None if value in ("null", None) else value
+        self._filters.append(lambda row: row.get(column) is expected)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = size
+        return self
+
+    def execute(self) -> FakeResponse:
+        self._client.round_trips += 1
+        rows = [dict(r) for r in self._client.tables.get(self._table, []) if all(f(r) for f in self._filters)]
+        if self._order:
+            column, desc = self._order
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return FakeResponse(rows)
+
+
+class FakeRpc:
+    def __init__(self, client: FakeSupabase, name: str, params: dict):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self) -> FakeResponse:
+        self._client.round_trips += 1
+        handler = getattr(self._client, f"_rpc_{self._name}", None)
+        if handler is None:
+            raise NotImplementedError(f"fake Supabase has no RPC {self._name}")
+        return FakeResponse(handler(**self._params))
+
+
+class FakeSupabase:
+    """
+    tables maps table name -> list of row dicts. pantry_items and
+    ingredient_substitutions rows carry updated_at, which the fake stamps
+    from a monotonic clock on every write so sync_changes deltas behave.
+    """
+
+    def __init__(self, tables: dict[str, list] | None = None):
+        self.tables: dict[str, list] = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.tombstones: list[dict] = []
+        self.deductions: dict[tuple, list] = {}  # (household_id, idempotency_key) -> log
+        self.round_trips = 0
+        self._epoch = datetime.now(timezone.utc)
+        self._ticks = itertools.count(1)
+        for name in ("pantry_items", "ingredient_substitutions"):
+            for row in self.tables.setdefault(name, []):
+                row.setdefault("updated_at", self._now())
+
+    def _now(self) -> str:
+        return (self._epoch + timedelta(microseconds=next(self._ticks))).isoformat()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> FakeRpc:
+        return FakeRpc(self, name, params or {})
+
+    def _rpc_sync_changes(self, p_household_id, p_since=None, p_pantry=True):
+        def changed(row):
+            return p_since is None or row["updated_at"] > p_since
+
+        return {
+            "pantry_items": [
+                dict(r) for r in self.tables["pantry_items"]
+                if p_pantry and r["household_id"] == p_household_id and changed(r)
+            ],
+            "ingredient_substitutions": [
+                dict(r) for r in self.tables["ingredient_substitutions"]
+                if r.get("household_id") in (None, p_household_id) and changed(r)
+            ],
+            "deleted": [] if p_since is None else [
+                {"table_name": t["table_name"], "row_id": t["row_id"]} for t in self.tombstones
+                if t["household_id"] in (None, p_household_id) and t["deleted_at"] > p_since
+            ],
+            "synced_at": self._now(),
+        }
+
+    def _rpc_deduct_pantry_items(self, p_household_id, p_deductions, p_idempotency_key):
+        replay = self.deductions.get((p_household_id, p_idempotency_key))
+        if replay is not None:
+            return list(replay)
+        by_id = {r["id"]: r for r in self.tables["pantry_items"] if r["household_id"] == p_household_id}
+        log = []
+        for d in p_deductions:
+            row = by_id.get(d["pantry_item_id"])
+            if row is None:
+                continue
+            new_qty = (row.get("quantity") or 0) - d["amount"]
+            if new_qty <= 0:
+                self.tables["pantry_items"].remove(row)
+                del by_id[row["id"]]
+                self.tombstones.append({
+                    "household_id": p_household_id, "table_name": "pantry_items",
+                    "row_id": row["id"], "deleted_at": self._now(),
+                })
+                log.append(f"Used all {row['specific_name']}")
+            else:
+                row["quantity"] = round(new_qty, 2)
+                row["updated_at"] = self._now()
+                log.append(d["label"])
+        self.deductions[(p_household_id, p_idempotency_key)] = log
+        return log
+
+    def _rpc_pantry_match_candidates(
+        self, p_household_id, p_name, p_equivalents=(), p_limit=5, p_ingredient_type_id=None
+    ):
+        low = p_name.lower()
+        wanted = {low, *(e.lower() for e in p_equivalents or ())}
+        type_names = [
+            " ".join(tokenize(r["name"])) for r in self.tables.get("ingredient_types", [])
+            if r["id"] == p_ingredient_type_id
+        ] + [
+            " ".join(tokenize(r["alias"])) for r in self.tables.get("ingredient_aliases", [])
+            if r["ingredient_type_id"] == p_ingredient_type_id
+        ]
+
+        def equivalent(row):
+            tokens = " ".join(tokenize(row["specific_name"]))
+            return row["specific_name"].lower() in wanted or any(
+                tokens == t or (" " in t and tokens.endswith(" " + t)) for t in type_names
+            )
+
+        rows = [r for r in self.tables["pantry_items"] if r["household_id"] == p_household_id]
+        exact = [r for r in rows if equivalent(r)]
+        rest = sorted(
+            (r for r in rows if not equivalent(r)),
+            key=lambda r: -ratio(low, r["specific_name"].lower()),
+        )
+        return [dict(r) for r in (exact + rest)[:max(p_limit, len(exact))]]
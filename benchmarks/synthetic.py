@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+"""
+Synthetic households for the benchmarks.
+
+Names are built from a small ingredient vocabulary (a base ingredient plus
+zero to two modifiers), with a share of recipe ingredients misspelled,
+re-cased or reordered so every matching step (exact, alias, substitution,
+fuzzy, no match) gets exercised. The same seed always builds the same data.
+"""
+
+import random
+import uuid
+from dataclasses import dataclass, field
+
+_BASES = [
+    "milk", "flour", "sugar", "salt", "black pepper", "garlic", "onion", "tomato", "tomato paste",
+    "butter", "egg", "cheddar cheese", "parmesan", "rice", "kidney beans", "cumin", "ground beef",
+    "chicken breast", "chicken thigh", "pork shoulder", "lime", "lemon", "olive oil", "vegetable oil",
+    "soy sauce", "honey", "maple syrup", "vanilla extract", "baking soda", "baking powder", "yeast",
+    "spinach", "carrot", "celery", "potato", "sweet potato", "broccoli", "cauliflower", "mushroom",
+    "bell pepper", "jalapeno", "cilantro", "parsley", "basil", "oregano", "thyme", "rosemary",
+    "paprika", "chili powder", "cinnamon", "nutmeg", "ginger", "chicken stock", "beef broth",
+    "white wine", "red wine vinegar", "heavy cream", "sour cream", "yogurt", "bread crumbs",
+    "pasta", "quinoa", "oats", "almonds", "walnuts", "peanut butter", "chocolate chips", "coconut milk",
+]
+_MODIFIERS = [
+    "fresh", "dried", "ground", "whole", "organic", "unsalted", "extra virgin", "low sodium",
+    "red", "yellow", "green", "brown", "white", "smoked", "canned", "frozen", "chopped", "large",
+]
+_UNITS = ["g", "kg", "ml", "l", "cup", "tbsp", "tsp", "oz", "lb", "count"]
+
+
+def _misspell(rng: random.Random, name: str) -> str:
+    if len(name) < 5:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    return rng.choice([name[:i] + name[i + 1:], name[:i] + name[i] + name[i:], name[:i] + name[i + 1] + name[i] + name[i + 2:]])
+
+
+def _vary(rng: random.Random, name: str) -> str:
+    """A recipe's spelling of a pantry name: usually the same, sometimes not quite."""
+    roll = rng.random()
+    if roll < 0.15:
+        return _misspell(rng, name)
+    if roll < 0.25:
+        return " ".join(reversed(name.split()))
+    if roll < 0.35:
+        return name.title()
+    return name
+
+
+@dataclass
+class Household:
+    id: str
+    tables: dict[str, list] = field(default_factory=dict)
+    pantry_names: list[str] = field(default_factory=list)
+    recipe_ids: list[str] = field(default_factory=list)
+    ingredient_names: list[str] = field(default_factory=list)
+
+
+def make_household(
+    pantry_items: int = 200,
+    substitution_pairs: int = 50,
+    recipes: int = 50,
+    ingredients_per_recipe: int = 10,
+    aliases: int = 40,
+    seed: int = 0,
+) -> Household:
+    """
+    Builds one household's pantry_items, ingredient_substitutions (half
+    global, half the household's), ingredient_types/ingredient_aliases and
+    recipes with recipe_ingredients, as FakeSupabase tables.
+    """
+    rng = random.Random(seed)
+    hh = Household(id=str(uuid.UUID(int=rng.getrandbits(128))))
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    names: set[str] = set()
+    while len(names) < pantry_items:
+        mods = rng.sample(_MODIFIERS, rng.choice([0, 0, 1, 1, 2]))
+        names.add(" ".join([*mods, rng.choice(_BASES)]))
+    hh.pantry_names = sorted(names)
+    pantry = [
+        {
+            "id": new_id(), "household_id": hh.id, "specific_name": name,
+            "quantity": float(rng.randint(500, 5000)), "unit": rng.choice(_UNITS),
+        }
+        for name in hh.pantry_names
+    ]
+
+    subs = []
+    for i in range(substitution_pairs):
+        a, b = rng.sample(hh.pantry_names + _BASES, 2)
+        subs.append({
+            "id": new_id(), "household_id": None if i % 2 else hh.id,
+            "ingredient_a": a, "ingredient_b": b,
+        })
+
+    types = [{"id": new_id(), "name": base} for base in _BASES]
+    alias_rows = []
+    for _ in range(aliases):
+        t = rng.choice(types)
+        alias_rows.append({"alias": f"{rng.choice(_MODIFIERS)} {t['name']}", "ingredient_type_id": t["id"]})
+
+    recipe_rows, ingredient_rows = [], []
+    pool = hh.pantry_names + _BASES
+    for _ in range(recipes):
+        recipe_id = new_id()
+        recipe_rows.append({"id": recipe_id, "title": f"Recipe {len(recipe_rows) + 1}", "servings": 4})
+        for name in rng.sample(pool, min(ingredients_per_recipe, len(pool))):
+            if rng.random() < 0.1:  # something the pantry will never have
+                name = f"{rng.choice(_MODIFIERS)} dragonfruit"
+            ingredient_rows.append({
+                "id": new_id(), "recipe_id": recipe_id, "name": _vary(rng, name), "ingredient_types": None,
+                "quantity": float(rng.randint(1, 4)), "unit": rng.choice(_UNITS), "note": None,
+            })
+    hh.recipe_ids = [r["id"] for r in recipe_rows]
+    hh.ingredient_names = [r["name"] for r in ingredient_rows]
+
+    hh.tables = {
+        "pantry_items": pantry,
+        "ingredient_substitutions": subs,
+        "ingredient_types": types,
+        "ingredient_aliases": alias_rows,
+        "recipes": recipe_rows,
+        "recipe_ingredients": ingredient_rows,
+    }
+    return hh
@@ -0,0 +1,168 @@
+"""
+Drains the pending_imports queue (recipes saved by the Chrome extension).
+
+    python import_worker.py                  # run until stopped
+    python import_worker.py --once           # drain the current backlog, then exit
+    python import_worker.py --batch-size 100 --workers 8
+
+Each round claims a batch with claim_pending_imports (FOR UPDATE SKIP LOCKED,
+so several workers can run side by side), parses the rows in a bounded
+thread pool, and writes every recipe, ingredient and status of the batch
+with one finish_pending_imports call. Rows that can't be parsed are marked
+failed with the reason. A batch that fails to finish leaves its rows to be
+reclaimed once stale, with the error noted on them; a row claimed more than
+--max-attempts times without a result is marked failed with that last error
+instead of being parsed again. One JSON line per batch reports throughput and
+latency; a summary is logged on exit.
+
+Needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY: the queue spans every user,
+so the worker can't run under one user's RLS.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from utils.recipe_import import (
+    ImportFailed,
+    claim_imports,
+    exhausted_failure,
+    finish_imports,
+    note_import_error,
+    parse_import,
+)
+
+logger = logging.getLogger("smartpantry.imports")
+
+_stopping = False
+
+
+def _stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def _parse_timed(row: dict) -> tuple[dict | None, str | None, float]:
+    start = time.perf_counter()
+    try:
+        recipe, error = parse_import(row), None
+    except ImportFailed as e:
+        recipe, error = None, str(e)
+    except Exception as e:  # a parser bug shouldn't take the batch down
+        recipe, error = None, f"unexpected error: {e!r}"
+    return recipe, error, (time.perf_counter() - start) * 1000
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_batch(sb, pool: ThreadPoolExecutor, batch_size: int, max_attempts: int = 5) -> dict | None:
+    """Claims, parses and finishes one batch. Returns its stats, or None when the queue is empty."""
+    start = time.perf_counter()
+    rows = claim_imports(sb, batch_size)
+    if not rows:
+        return None
+    claimed = time.perf_counter()
+
+    failures = [f for f in (exhausted_failure(row, max_attempts) for row in rows) if f is not None]
+    given_up = {f["import_id"] for f in failures}
+    to_parse = [row for row in rows if row["id"] not in given_up]
+
+    try:
+        recipes, parse_ms = [], []
+        for row, (recipe, error, ms) in zip(to_parse, pool.map(_parse_timed, to_parse)):
+            parse_ms.append(ms)
+            if recipe is not None:
+                recipes.append(recipe)
+            else:
+                failures.append({"import_id": row["id"], "error": error[:500]})
+        parsed = time.perf_counter()
+
+        rejected = finish_imports(sb, recipes, failures)
+    except Exception as e:
+        try:
+            note_import_error(sb, [row["id"] for row in rows], f"batch failed: {e!r}")
+        except Exception:
+            logger.exception("could not record the batch error")
+        raise
+    done = time.perf_counter()
+
+    total_s = done - start
+    return {
+        "claimed": len(rows),
+        "processed": len(recipes) - len(rejected),
+        "failed": len(failures) + len(rejected),
+        "ingredients": sum(len(r["ingredients"]) for r in recipes),
+        "claim_ms": round((claimed - start) * 1000, 1),
+        "parse_ms": round((parsed - claimed) * 1000, 1),
+        "parse_row_ms_p50": round(statistics.median(parse_ms), 1) if parse_ms else 0.0,
+        "parse_row_ms_p95": round(_percentile(parse_ms, 95), 1),
+        "write_ms": round((done - parsed) * 1000, 1),
+        "batch_ms": round(total_s * 1000, 1),
+        "rows_per_s": round(len(rows) / total_s, 1) if total_s else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drain the pending_imports queue.")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows claimed per round (default 50)")
+    parser.add_argument("--workers", type=int, default=4, help="parser threads (default 4)")
+    parser.add_argument("--poll-seconds", type=float, default=5.0, help="sleep when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    parser.add_argument(
+        "--max-attempts", type=int, default=5, help="claims without a result before a row is failed (default 5)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    load_dotenv()
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+    sb = create_client(url, key)
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    totals = {"batches": 0, "claimed": 0, "processed": 0, "failed": 0}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="import-parse") as pool:
+        while not _stopping:
+            try:
+                stats = run_batch(sb, pool, args.batch_size, args.max_attempts)
+            except Exception:
+                # Claimed rows stay 'processing' and are reclaimed once stale
+                logger.exception("batch failed")
+                stats = None
+                if args.once:
+                    break
+            if stats is None:
+                if args.once:
+                    break
+                time.sleep(args.poll_seconds)
+                continue
+            totals["batches"] += 1
+            for field in ("claimed", "processed", "failed"):
+                totals[field] += stats[field]
+            logger.info(json.dumps({"batch": stats}))
+
+    elapsed = time.perf_counter() - started
+    totals["elapsed_s"] = round(elapsed, 1)
+    totals["rows_per_s"] = round(totals["claimed"] / elapsed, 1) if elapsed else None
+    logger.info(json.dumps({"summary": totals}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Offline pantry coverage for many recipes at once, without Streamlit or Supabase.
+
+    python match_batch.py --pantry pantry.jsonl --recipes recipes.jsonl > coverage.jsonl
+    python match_batch.py --pantry pantry.jsonl --recipes recipes.jsonl \\
+        --substitutions subs.jsonl --aliases aliases.jsonl --out coverage.jsonl --workers -1
+
+Inputs are JSON Lines:
+
+    pantry         {"specific_name": "Goat Milk", "household_id": "h1"}   (quantity/unit ignored)
+    recipes        {"id": "r1", "title": "Pancakes", "ingredients": ["flour" | {"name": ...}, ...]}
+    substitutions  {"ingredient_a": "EVOO", "ingredient_b": "Olive Oil", "household_id": null}
+    aliases        {"alias": "Goat Milk", "type": "Milk"}
+
+Pantry rows may carry a household_id; every recipe is then scored against
+every household's pantry, with global (null household_id) substitution pairs
+plus that household's own. Ingredients given as plain strings must be bare
+names ("flour", not "2 cups flour"): they are used as the name as-is, with no
+quantity or unit parsing. Each output line is
+
+    {"household_id", "recipe_id", "title", "have", "total", "match_pct", "missing": [names]}
+
+Matching is utils.matching, the same core the app uses: every distinct
+ingredient name in the recipe file is matched once per household in one
+batched call, and recipes are scored from those results.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from utils.ingredient_aliases import AliasIndex
+from utils.matching import SubstitutionIndex, coverage, ingredient_name, match_indices, normalize_name
+
+
+def _read_jsonl(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _alias_index(rows: list[dict]) -> AliasIndex:
+    """Aliases point at type names, which double as the type ids."""
+    types = {row["type"] for row in rows}
+    return AliasIndex(
+        [{"id": name, "name": name} for name in types],
+        [{"alias": row["alias"], "ingredient_type_id": row["type"]} for row in rows],
+    )
+
+
+def _ingredient_rows(recipe: dict) -> list[dict]:
+    return [ing if isinstance(ing, dict) else {"name": ing} for ing in recipe.get("ingredients") or []]
+
+
+def score_households(
+    pantry: list[dict], recipes: list[dict], substitutions: list[dict], aliases: AliasIndex, workers: int = 1
+):
+    """Yields one coverage result per (household, recipe)."""
+    households: dict = {}
+    for row in pantry:
+        households.setdefault(row.get("household_id"), []).append(row["specific_name"])
+
+    rows_by_recipe = [_ingredient_rows(recipe) for recipe in recipes]
+    needles = sorted({normalize_name(ingredient_name(ing)) for rows in rows_by_recipe for ing in rows} - {""})
+
+    for household_id, pantry_names in households.items():
+        index = SubstitutionIndex([s for s in substitutions if s.get("household_id") in (None, household_id)])
+        found = dict(zip(needles, match_indices(needles, pantry_names, index, workers, aliases)))
+        for recipe, rows in zip(recipes, rows_by_recipe):
+            result = coverage(rows, [found.get(normalize_name(ingredient_name(ing))) for ing in rows])
+            yield {
+                "household_id": household_id,
+                "recipe_id": recipe.get("id"),
+                "title": recipe.get("title"),
+                "have": len(result["have"]),
+                "total": result["total"],
+                "match_pct": round(result["match_pct"], 1),
+                "missing": [ingredient_name(ing) for ing in result["missing"]],
+            }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score recipes against pantries offline.")
+    parser.add_argument("--pantry", required=True, help="pantry items JSONL")
+    parser.add_argument("--recipes", required=True, help="recipes JSONL")
+    parser.add_argument("--substitutions", help="substitution pairs JSONL")
+    parser.add_argument("--aliases", help="alias -> type JSONL")
+    parser.add_argument("--out", help="output JSONL (default stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="rapidfuzz scoring threads (-1 = all cores)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pantry = _read_jsonl(args.pantry)
+    recipes = _read_jsonl(args.recipes)
+    substitutions = _read_jsonl(args.substitutions) if args.substitutions else []
+    aliases = _alias_index(_read_jsonl(args.aliases)) if args.aliases else AliasIndex([], [])
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    written = 0
+    try:
+        for result in score_households(pantry, recipes, substitutions, aliases, args.workers):
+            out.write(json.dumps(result) + "\n")
+            written += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{written} results for {len(recipes)} recipes in {elapsed:.2f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
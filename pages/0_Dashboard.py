@@ -1,17 +1,21 @@
 import streamlit as st
-from utils.supabase_client import get_client, get_session, get_household, sign_out, persist_auth, clear_persisted_auth
+from utils.supabase_client import get_session, get_household, sign_out, persist_auth, clear_persisted_auth
+from utils import cache_events, query_log
+from utils.dashboard import get_dashboard_stats
 
 st.set_page_config(page_title="Dashboard | SmartPantry", page_icon="🍎", layout="wide")
 
+query_log.start_run("Dashboard")
+
 # ── Auth check ────────────────────────────────────────────────
 session = get_session()
 if not session:
     st.switch_page("app.py")
 
-persist_auth()  # Keep tokens fresh in localStorage across browser refreshes
+session = persist_auth()  # Refreshes tokens near expiry; saves them to localStorage when they change
 
 # ── Household bootstrap ───────────────────────────────────────
-if "household" not in st.session_state:
+if not st.session_state.get("household"):
     st.session_state.household = get_household()
 
     if not st.session_state.household:
@@ -46,6 +50,7 @@ if not household:
     st.stop()
 
 hh = household
+cache_events.watch_household(hh["id"], session.access_token)
 st.subheader(f"Welcome to {hh['name']}")
 
 col_invite, col_spacer = st.columns([2, 3])
@@ -55,22 +60,17 @@ with col_invite:
 st.markdown("---")
 
 # ── Summary cards ─────────────────────────────────────────────
-sb = get_client()
-pantry_result = (
-    sb.table("pantry_items")
-    .select("id", count="exact")
-    .eq("household_id", hh["id"])
-    .execute()
-)
-pantry_count = pantry_result.count or 0
-
-card1, card2, card3 = st.columns(3)
+stats = get_dashboard_stats(hh["id"])
+
+card1, card2, card3, card4 = st.columns(4)
 with card1:
-    st.metric("Pantry Items", pantry_count)
+    st.metric("Pantry Items", stats["pantry_items"])
 with card2:
-    st.metric("Saved Recipes", "—")
+    st.metric("Saved Recipes", stats["saved_recipes"])
 with card3:
-    st.metric("This Week's Meals", "—")
+    st.metric("This Week's Meals", stats["meals_this_week"])
+with card4:
+    st.metric("Cookable Now", stats["cookable_recipes"])
 
 st.markdown("---")
 
@@ -81,4 +81,6 @@ with col_meals:
 
 with col_shopping:
     st.subheader("Shopping List")
-    st.caption("Shopping list coming soon.")
+    st.caption(f"{stats['shopping_unchecked']} item(s) still to buy.")
+
+query_log.finish_run("Dashboard")
@@ -1,18 +1,31 @@
 import streamlit as st
 from utils.supabase_client import get_client, get_session, get_household, join_household, persist_auth
-from utils.ingredient_matcher import names_match, get_substitutions
+from utils import cache_events, page_data, pantry_snapshot, query_log
+from utils.ingredient_matcher import (
+    get_substitutions,
+    clear_substitution_cache,
+    find_pantry_item,
+    bump_pantry_version,
+)
+from utils.pantry_store import diff_inventory, apply_inventory_changes
+from utils.shopping_list import refresh_for_pantry
+from utils.units import canonical_unit, convert
 
 st.set_page_config(page_title="Pantry | SmartPantry", page_icon="📦", layout="wide")
 
+INVENTORY_WINDOW = 100  # rows per page of the inventory grid
+
+query_log.start_run("Pantry")
+
 # ── Auth check ────────────────────────────────────────────────
 session = get_session()
 if not session:
     st.switch_page("app.py")
 
-persist_auth()  # Keep tokens fresh in localStorage across browser refreshes
+session = persist_auth()  # Refreshes tokens near expiry; saves them to localStorage when they change
 
 # ── Household check ───────────────────────────────────────────
-if "household" not in st.session_state:
+if not st.session_state.get("household"):
     st.session_state.household = get_household()
 
 household = st.session_state.household
@@ -42,6 +55,13 @@ if not household:
 
 sb = get_client()
 hh_id = household["id"]
+cache_events.watch_household(hh_id, session.access_token)
+
+# Both sections' data, fetched together rather than one after the other
+data = page_data.load(
+    substitutions=lambda: get_substitutions(hh_id),
+    item_count=lambda: pantry_snapshot.pantry_count(hh_id),
+)
 
 # ── Page ──────────────────────────────────────────────────────
 st.title("📦 My Pantry")
@@ -69,36 +89,42 @@ with st.expander("➕ Add an item to your pantry", expanded=False):
         submitted = st.form_submit_button("Add to Pantry")
 
     if submitted and specific_name:
-        all_items = (
-            sb.table("pantry_items")
-            .select("id, specific_name, quantity")
-            .eq("household_id", hh_id)
-            .execute()
-        ).data
-        subs = get_substitutions()
-        existing = next(
-            (i for i in all_items if names_match(specific_name, i["specific_name"], subs)),
-            None,
-        )
-
-        if existing:
-            new_qty = (existing["quantity"] or 0) + quantity
-            sb.table("pantry_items").update({
-                "quantity": new_qty,
-                "specific_name": specific_name,
-            }).eq("id", existing["id"]).execute()
-            st.session_state["_pantry_msg"] = (f"Updated **{specific_name}** — now {new_qty} {unit} on hand.", "success")
+        existing = find_pantry_item(specific_name, hh_id)
+        unit = canonical_unit(unit)
+        # Keep the stored unit; what was added must convert into it
+        added = convert(quantity, unit, existing["unit"]) if existing else None
+
+        if existing and added is None:
+            # Never sum quantities in units that don't convert (cups onto lb); leave the row alone
+            st.error(
+                f"**{existing['specific_name']}** is tracked in {existing['unit']}, and {unit} "
+                f"can't be converted to that. Add it in {existing['unit']} or a unit that converts."
+            )
         else:
-            sb.table("pantry_items").insert({
-                "household_id": hh_id,
-                "specific_name": specific_name,
-                "quantity": quantity,
-                "unit": unit,
-            }).execute()
-            st.session_state["_pantry_msg"] = (f"Added **{specific_name}** to pantry.", "success")
-
-        st.session_state.add_item_n += 1
-        st.rerun()
+            changed_ids = []
+            if existing:
+                changed_ids.append(existing["id"])
+                new_qty = round((existing["quantity"] or 0) + added, 2)
+                sb.table("pantry_items").update({
+                    "quantity": new_qty,
+                    "specific_name": specific_name,
+                }).eq("id", existing["id"]).execute()
+                st.session_state["_pantry_msg"] = (
+                    f"Updated **{specific_name}** — now {new_qty} {existing['unit']} on hand.", "success"
+                )
+            else:
+                sb.table("pantry_items").insert({
+                    "household_id": hh_id,
+                    "specific_name": specific_name,
+                    "quantity": quantity,
+                    "unit": unit,
+                }).execute()
+                st.session_state["_pantry_msg"] = (f"Added **{specific_name}** to pantry.", "success")
+
+            bump_pantry_version(hh_id)
+            refresh_for_pantry(hh_id, [specific_name], changed_ids)
+            st.session_state.add_item_n += 1
+            st.rerun()
 
 st.markdown("---")
 
@@ -107,7 +133,7 @@ if "add_sub_n" not in st.session_state:
     st.session_state.add_sub_n = 0
 
 with st.expander("🔄 Substitutions — treat these ingredients as interchangeable", expanded=False):
-    subs = get_substitutions()
+    subs = data["substitutions"]
     hh_subs = [s for s in subs if s.get("household_id") == hh_id]
 
     with st.form(f"add_sub_{st.session_state.add_sub_n}"):
@@ -124,7 +150,7 @@ with st.expander("🔄 Substitutions — treat these ingredients as interchangea
                         "ingredient_a": sub_a.strip(),
                         "ingredient_b": sub_b.strip(),
                     }).execute()
-                    get_substitutions.clear()
+                    clear_substitution_cache(hh_id)
                     st.session_state.add_sub_n += 1
                     st.rerun()
                 except Exception:
@@ -138,7 +164,7 @@ with st.expander("🔄 Substitutions — treat these ingredients as interchangea
             with c2:
                 if st.button("🗑️", key=f"del_sub_{pair['id']}"):
                     sb.table("ingredient_substitutions").delete().eq("id", pair["id"]).execute()
-                    get_substitutions.clear()
+                    clear_substitution_cache(hh_id)
                     st.rerun()
     else:
         st.caption("No substitutions yet. Add pairs above.")
@@ -148,36 +174,80 @@ st.markdown("---")
 # ── Current pantry inventory ──────────────────────────────────
 st.subheader("Current Inventory")
 
-items = (
-    sb.table("pantry_items")
-    .select("id, specific_name, quantity, unit")
-    .eq("household_id", hh_id)
-    .order("specific_name")
-    .execute()
-).data
+if pantry_snapshot.is_offline(hh_id):
+    st.warning("Couldn't reach the server — showing your pantry as of the last sync.")
+
+if "inventory_n" not in st.session_state:
+    st.session_state.inventory_n = 0
+
+# Large pantries render one window at a time, so the grid (and the payload
+# sent to the browser) stays the same size however big the pantry gets.
+# Each window starts after the last row of the one before it (a keyset cursor
+# into the snapshot's name index), so paging deep costs the same as page one.
+item_count = data["item_count"]
+cursors = st.session_state.setdefault("inventory_cursors", [None])
+items = pantry_snapshot.pantry_window(hh_id, cursors[-1], INVENTORY_WINDOW)
+if not items and len(cursors) > 1:
+    # Rows removed elsewhere emptied this window; start over from the top
+    del cursors[1:]
+    items = pantry_snapshot.pantry_window(hh_id, None, INVENTORY_WINDOW)
+window = len(cursors)
 
 if not items:
     st.info("Your pantry is empty. Add items above.")
 else:
-    for item in items:
-        col1, col2, col3, col4 = st.columns([4, 1, 1, 1])
-        with col1:
-            st.write(item["specific_name"])
-        with col2:
-            st.write(f"{item['quantity']} {item['unit']}")
-        with col3:
-            new_qty = st.number_input(
-                "Adj",
-                min_value=0.0,
-                value=float(item["quantity"]),
-                step=0.5,
-                key=f"qty_{item['id']}",
-                label_visibility="collapsed",
-            )
-            if new_qty != item["quantity"]:
-                sb.table("pantry_items").update({"quantity": new_qty}).eq("id", item["id"]).execute()
+    first = (window - 1) * INVENTORY_WINDOW + 1
+    last = first + len(items) - 1
+    if item_count > INVENTORY_WINDOW:
+        col_prev, col_next, col_range = st.columns([1, 1, 4])
+        with col_prev:
+            if st.button("◀ Previous", disabled=window == 1):
+                cursors.pop()
                 st.rerun()
-        with col4:
-            if st.button("🗑️", key=f"del_{item['id']}"):
-                sb.table("pantry_items").delete().eq("id", item["id"]).execute()
+        with col_next:
+            if st.button("Next ▶", disabled=len(items) < INVENTORY_WINDOW or last >= item_count):
+                cursors.append((items[-1]["specific_name"], items[-1]["id"]))
                 st.rerun()
+        with col_range:
+            st.caption(f"Showing {first}–{last} of {item_count} items")
+
+    # Edits are collected in the form and written in one batch on save, so
+    # changing ten quantities costs one round trip and one rerun, not ten.
+    with st.form(f"inventory_{st.session_state.inventory_n}_{window}"):
+        edited = st.data_editor(
+            [
+                {
+                    "id": item["id"],
+                    "specific_name": item["specific_name"],
+                    "quantity": float(item["quantity"] or 0),
+                    "unit": item["unit"],
+                    "remove": False,
+                }
+                for item in items
+            ],
+            column_config={
+                "id": None,
+                "specific_name": st.column_config.TextColumn("Item", required=True),
+                "quantity": st.column_config.NumberColumn("Qty", min_value=0.0, step=0.5),
+                "unit": st.column_config.TextColumn("Unit"),
+                "remove": st.column_config.CheckboxColumn("🗑️ Remove"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+        saved = st.form_submit_button("Save changes")
+
+    if saved:
+        upserts, deleted_ids = diff_inventory(items, edited, hh_id)
+        if upserts or deleted_ids:
+            apply_inventory_changes(hh_id, upserts, deleted_ids)
+            st.session_state["_pantry_msg"] = (
+                f"Saved {len(upserts)} update(s) and {len(deleted_ids)} removal(s).",
+                "success",
+            )
+        else:
+            st.session_state["_pantry_msg"] = ("No changes to save.", "info")
+        st.session_state.inventory_n += 1
+        st.rerun()
+
+query_log.finish_run("Pantry")
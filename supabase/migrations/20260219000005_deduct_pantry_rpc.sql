@@ -0,0 +1,82 @@
+-- Atomic, single-round-trip pantry deduction for "cook this recipe".
+-- deduct_from_pantry() matches ingredients in Python and sends the resulting
+-- deductions here in one call; every update/delete runs in one transaction,
+-- so a failure part-way leaves the pantry untouched.
+
+-- One row per completed deduction, keyed by the caller's idempotency key,
+-- so a repeated call (e.g. a double-clicked "cook") replays the first log
+-- instead of deducting twice.
+CREATE TABLE pantry_deductions (
+    idempotency_key TEXT PRIMARY KEY,
+    household_id    UUID NOT NULL REFERENCES households(id) ON DELETE CASCADE,
+    log             JSONB NOT NULL,
+    created_at      TIMESTAMPTZ DEFAULT now()
+);
+
+GRANT SELECT, INSERT ON pantry_deductions TO authenticated;
+ALTER TABLE pantry_deductions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "pd_select" ON pantry_deductions
+    FOR SELECT TO authenticated
+    USING (household_id = my_household_id());
+
+CREATE POLICY "pd_insert" ON pantry_deductions
+    FOR INSERT TO authenticated
+    WITH CHECK (household_id = my_household_id());
+
+-- p_deductions: [{"pantry_item_id": uuid, "amount": number, "label": text}, ...]
+-- Applied in order. An item that drops to zero or below is deleted and logged
+-- as "Used all <name>"; otherwise its quantity is reduced and label is logged.
+-- Runs as the caller, so pantry_items RLS still applies.
+CREATE OR REPLACE FUNCTION deduct_pantry_items(
+    p_household_id    UUID,
+    p_deductions      JSONB,
+    p_idempotency_key TEXT
+)
+RETURNS JSONB AS $$
+DECLARE
+    d       JSONB;
+    item    pantry_items%ROWTYPE;
+    new_qty NUMERIC;
+    v_log   JSONB := '[]'::jsonb;
+BEGIN
+    -- Concurrent calls with the same key queue here; the second one then replays.
+    PERFORM pg_advisory_xact_lock(hashtext(p_idempotency_key));
+
+    SELECT pd.log INTO v_log
+    FROM pantry_deductions pd
+    WHERE pd.idempotency_key = p_idempotency_key;
+    IF FOUND THEN
+        RETURN v_log;
+    END IF;
+    v_log := '[]'::jsonb;
+
+    FOR d IN SELECT * FROM jsonb_array_elements(p_deductions) LOOP
+        SELECT * INTO item
+        FROM pantry_items
+        WHERE id = (d->>'pantry_item_id')::uuid
+          AND household_id = p_household_id
+        FOR UPDATE;
+        -- Already used up by an earlier ingredient in this batch
+        CONTINUE WHEN NOT FOUND;
+
+        new_qty := COALESCE(item.quantity, 0) - (d->>'amount')::numeric;
+        IF new_qty <= 0 THEN
+            DELETE FROM pantry_items WHERE id = item.id;
+            v_log := v_log || to_jsonb('Used all ' || item.specific_name);
+        ELSE
+            UPDATE pantry_items
+            SET quantity = round(new_qty, 2), updated_at = now()
+            WHERE id = item.id;
+            v_log := v_log || to_jsonb(d->>'label');
+        END IF;
+    END LOOP;
+
+    INSERT INTO pantry_deductions (idempotency_key, household_id, log)
+    VALUES (p_idempotency_key, p_household_id, v_log);
+
+    RETURN v_log;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+GRANT EXECUTE ON FUNCTION deduct_pantry_items(UUID, JSONB, TEXT) TO authenticated;
@@ -0,0 +1,47 @@
+-- Server-side candidate lookup for the pantry add-item dedupe.
+-- Instead of downloading the whole pantry and fuzzy-matching every row in
+-- Python, the app asks for the few rows most similar to the new name and
+-- runs the exact/substitution/fuzzy check on that short list only.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+
+-- Same normalization as ingredient_matcher.normalize_name()
+ALTER TABLE pantry_items
+    ADD COLUMN IF NOT EXISTS specific_name_norm TEXT
+    GENERATED ALWAYS AS (lower(btrim(specific_name))) STORED;
+
+CREATE INDEX IF NOT EXISTS pantry_items_household_idx
+    ON pantry_items (household_id);
+
+CREATE INDEX IF NOT EXISTS pantry_items_name_norm_trgm_idx
+    ON pantry_items USING GIN (specific_name_norm extensions.gin_trgm_ops);
+
+-- Returns up to p_limit of the household's pantry rows that could match p_name:
+-- exact name first, then rows named in p_equivalents (the name's substitution
+-- class, already normalized), then by trigram similarity.
+-- The 0.2 similarity floor keeps every pair that token_sort_ratio >= 82 accepts
+-- (short names and single-letter typos sit around 0.25–0.3).
+CREATE OR REPLACE FUNCTION pantry_match_candidates(
+    p_household_id UUID,
+    p_name         TEXT,
+    p_equivalents  TEXT[] DEFAULT '{}',
+    p_limit        INTEGER DEFAULT 5
+)
+RETURNS SETOF pantry_items AS $$
+    SELECT p.*
+    FROM pantry_items p
+    WHERE p.household_id = p_household_id
+      AND (
+          p.specific_name_norm = lower(btrim(p_name))
+          OR p.specific_name_norm = ANY(p_equivalents)
+          OR p.specific_name_norm OPERATOR(extensions.%) lower(btrim(p_name))
+      )
+    ORDER BY
+        p.specific_name_norm = lower(btrim(p_name)) DESC,
+        p.specific_name_norm = ANY(p_equivalents) DESC,
+        extensions.similarity(p.specific_name_norm, lower(btrim(p_name))) DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY INVOKER
+SET pg_trgm.similarity_threshold = 0.2;
+
+GRANT EXECUTE ON FUNCTION pantry_match_candidates(UUID, TEXT, TEXT[], INTEGER) TO authenticated;
@@ -0,0 +1,89 @@
+-- Every Dashboard aggregate for a household in one call, instead of one
+-- count="exact" query per summary card.
+--
+-- SECURITY DEFINER so "saved recipes" can see every household member's
+-- recipes (hm_select only exposes the caller's own membership row); the
+-- guard below keeps callers to their own household.
+--
+-- cookable_recipes counts saved recipes whose every ingredient is on hand by
+-- exact name, a direct substitution pair, or trigram similarity >= 0.5. That
+-- is a close SQL stand-in for the app's matcher (token_sort_ratio >= 82,
+-- transitive substitutions), so it can differ from the recipe checker for a
+-- few borderline names.
+CREATE OR REPLACE FUNCTION dashboard_stats(p_household_id UUID)
+RETURNS JSONB AS $$
+BEGIN
+    IF p_household_id IS DISTINCT FROM my_household_id() THEN
+        RAISE EXCEPTION 'not a member of household %', p_household_id
+            USING ERRCODE = '42501';
+    END IF;
+
+    RETURN (
+        WITH pantry AS (
+            SELECT specific_name_norm AS name
+            FROM pantry_items
+            WHERE household_id = p_household_id
+        ),
+        saved AS (
+            SELECT r.id
+            FROM recipes r
+            JOIN household_members hm ON hm.user_id = r.created_by
+            WHERE hm.household_id = p_household_id
+        ),
+        subs AS (
+            SELECT lower(btrim(ingredient_a)) AS a, lower(btrim(ingredient_b)) AS b
+            FROM ingredient_substitutions
+            WHERE household_id IS NULL OR household_id = p_household_id
+        ),
+        ingredients AS (
+            SELECT ri.recipe_id, lower(btrim(COALESCE(it.name, ri.name, ''))) AS name
+            FROM recipe_ingredients ri
+            LEFT JOIN ingredient_types it ON it.id = ri.ingredient_type_id
+            WHERE ri.recipe_id IN (SELECT id FROM saved)
+        ),
+        missing AS (
+            SELECT DISTINCT i.recipe_id
+            FROM ingredients i
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM pantry p
+                WHERE p.name = i.name
+                   OR p.name OPERATOR(extensions.%) i.name
+                   OR EXISTS (
+                       SELECT 1 FROM subs s
+                       WHERE (s.a = i.name AND s.b = p.name)
+                          OR (s.b = i.name AND s.a = p.name)
+                   )
+            )
+        )
+        SELECT jsonb_build_object(
+            'pantry_items', (SELECT count(*) FROM pantry),
+            'saved_recipes', (SELECT count(*) FROM saved),
+            'meals_this_week', (
+                SELECT count(*)
+                FROM meal_plan_recipes mpr
+                JOIN meal_plans mp ON mp.id = mpr.meal_plan_id
+                WHERE mp.household_id = p_household_id
+                  AND mpr.meal_date >= date_trunc('week', current_date)::date
+                  AND mpr.meal_date <  date_trunc('week', current_date)::date + 7
+            ),
+            'shopping_unchecked', (
+                SELECT count(*)
+                FROM shopping_list_items
+                WHERE household_id = p_household_id
+                  AND NOT COALESCE(is_checked, false)
+            ),
+            'cookable_recipes', (
+                SELECT count(*)
+                FROM saved s
+                WHERE EXISTS (SELECT 1 FROM ingredients i WHERE i.recipe_id = s.id)
+                  AND s.id NOT IN (SELECT recipe_id FROM missing)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER
+SET search_path = public, extensions
+SET pg_trgm.similarity_threshold = 0.5;
+
+GRANT EXECUTE ON FUNCTION dashboard_stats(UUID) TO authenticated;
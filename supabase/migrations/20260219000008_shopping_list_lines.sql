@@ -0,0 +1,15 @@
+-- Shopping list lines generated from meal plans.
+-- Each generated line is one (normalized ingredient name, unit) of a plan, so
+-- the generator can upsert and delete individual lines when only part of the
+-- plan or pantry changes.
+
+-- Imported recipes have no ingredient_types link, so generated lines can't require one
+ALTER TABLE shopping_list_items ALTER COLUMN ingredient_type_id DROP NOT NULL;
+
+-- "<normalized name>|<unit>"; NULL for ad-hoc items added by hand
+ALTER TABLE shopping_list_items ADD COLUMN IF NOT EXISTS line_key TEXT;
+
+ALTER TABLE shopping_list_items
+    ADD CONSTRAINT shopping_list_items_plan_line_key UNIQUE (meal_plan_id, line_key);
+
+GRANT ALL ON shopping_list_items TO authenticated;
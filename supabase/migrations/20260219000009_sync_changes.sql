@@ -0,0 +1,128 @@
+-- Delta sync for the app's local pantry snapshot (utils/pantry_snapshot.py).
+-- Instead of re-downloading the whole pantry and substitution set on every
+-- page load, the app asks for rows changed since its last sync plus the ids
+-- of rows deleted since then.
+
+-- updated_at has to move on every write, not just the ones that remember to set it
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pantry_items_touch ON pantry_items;
+CREATE TRIGGER pantry_items_touch
+    BEFORE INSERT OR UPDATE ON pantry_items
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+ALTER TABLE ingredient_substitutions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+DROP TRIGGER IF EXISTS ingredient_substitutions_touch ON ingredient_substitutions;
+CREATE TRIGGER ingredient_substitutions_touch
+    BEFORE INSERT OR UPDATE ON ingredient_substitutions
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS pantry_items_household_updated_idx
+    ON pantry_items (household_id, updated_at);
+
+CREATE INDEX IF NOT EXISTS ingredient_substitutions_updated_idx
+    ON ingredient_substitutions (updated_at);
+
+-- One row per deleted pantry item / substitution pair. household_id NULL
+-- marks a deleted global substitution. Kept for 30 days; a client whose last
+-- sync is older than that does a full resync instead.
+CREATE TABLE sync_tombstones (
+    table_name   TEXT NOT NULL,
+    row_id       UUID NOT NULL,
+    household_id UUID,
+    deleted_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (table_name, row_id)
+);
+
+CREATE INDEX IF NOT EXISTS sync_tombstones_household_idx
+    ON sync_tombstones (household_id, deleted_at);
+
+CREATE INDEX IF NOT EXISTS sync_tombstones_deleted_at_idx
+    ON sync_tombstones (deleted_at);
+
+GRANT SELECT ON sync_tombstones TO authenticated;
+ALTER TABLE sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "st_select" ON sync_tombstones
+    FOR SELECT TO authenticated
+    USING (household_id IS NULL OR household_id = my_household_id());
+
+-- SECURITY DEFINER: callers can't insert into sync_tombstones directly
+CREATE OR REPLACE FUNCTION record_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sync_tombstones (table_name, row_id, household_id)
+    VALUES (TG_TABLE_NAME, OLD.id, OLD.household_id)
+    ON CONFLICT (table_name, row_id) DO UPDATE SET deleted_at = now();
+
+    DELETE FROM sync_tombstones WHERE deleted_at < now() - interval '30 days';
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public;
+
+DROP TRIGGER IF EXISTS pantry_items_tombstone ON pantry_items;
+CREATE TRIGGER pantry_items_tombstone
+    AFTER DELETE ON pantry_items
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone();
+
+DROP TRIGGER IF EXISTS ingredient_substitutions_tombstone ON ingredient_substitutions;
+CREATE TRIGGER ingredient_substitutions_tombstone
+    AFTER DELETE ON ingredient_substitutions
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone();
+
+-- Everything a household's snapshot needs since p_since, in one round trip:
+--   {"synced_at": ts, "pantry_items": [...], "ingredient_substitutions": [...],
+--    "deleted": [{"table_name": ..., "row_id": ...}]}
+-- p_since NULL returns every row and no tombstones (a full resync).
+-- Substitutions are the household's own plus the global ones.
+-- Runs as the caller, so RLS still decides what is visible.
+CREATE OR REPLACE FUNCTION sync_changes(
+    p_household_id UUID,
+    p_since        TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'synced_at', now(),
+        'pantry_items', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', p.id,
+                'specific_name', p.specific_name,
+                'quantity', p.quantity,
+                'unit', p.unit,
+                'updated_at', p.updated_at
+            ))
+            FROM pantry_items p
+            WHERE p.household_id = p_household_id
+              AND (p_since IS NULL OR p.updated_at > p_since)
+        ), '[]'::jsonb),
+        'ingredient_substitutions', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', s.id,
+                'household_id', s.household_id,
+                'ingredient_a', s.ingredient_a,
+                'ingredient_b', s.ingredient_b,
+                'updated_at', s.updated_at
+            ))
+            FROM ingredient_substitutions s
+            WHERE (s.household_id IS NULL OR s.household_id = p_household_id)
+              AND (p_since IS NULL OR s.updated_at > p_since)
+        ), '[]'::jsonb),
+        'deleted', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('table_name', t.table_name, 'row_id', t.row_id))
+            FROM sync_tombstones t
+            WHERE p_since IS NOT NULL
+              AND (t.household_id IS NULL OR t.household_id = p_household_id)
+              AND t.deleted_at > p_since
+        ), '[]'::jsonb)
+    );
+$$ LANGUAGE sql STABLE SECURITY INVOKER;
+
+GRANT EXECUTE ON FUNCTION sync_changes(UUID, TIMESTAMPTZ) TO authenticated;
@@ -0,0 +1,22 @@
+-- Publish the tables utils/cache_events.py listens to, so the app can
+-- invalidate one household's caches when its pantry or substitutions change
+-- instead of waiting out a TTL. Deletes arrive as sync_tombstones inserts,
+-- which carry household_id (a deleted row's old record doesn't under RLS).
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        CREATE PUBLICATION supabase_realtime;
+    END IF;
+
+    FOREACH t IN ARRAY ARRAY['pantry_items', 'ingredient_substitutions', 'sync_tombstones'] LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_publication_tables
+            WHERE pubname = 'supabase_realtime' AND schemaname = 'public' AND tablename = t
+        ) THEN
+            EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE public.%I', t);
+        END IF;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,81 @@
+-- Queue semantics for pending_imports, consumed by import_worker.py.
+-- Workers claim batches with FOR UPDATE SKIP LOCKED, so any number of them
+-- can drain the queue without handing the same row to two workers, and then
+-- write every recipe, ingredient and status of a batch in one transaction.
+-- Both functions are for the worker's service-role key only.
+
+-- status: 'pending' -> 'processing' -> 'processed' | 'failed'
+ALTER TABLE pending_imports ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
+ALTER TABLE pending_imports ADD COLUMN IF NOT EXISTS attempts   INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pending_imports ADD COLUMN IF NOT EXISTS error      TEXT;
+ALTER TABLE pending_imports ADD COLUMN IF NOT EXISTS recipe_id  UUID REFERENCES recipes(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS pending_imports_queue_idx
+    ON pending_imports (status, created_at)
+    WHERE status IN ('pending', 'processing');
+
+-- Claims up to p_limit rows, oldest first. Rows a crashed worker left in
+-- 'processing' for longer than p_stale_after are claimed again. attempts
+-- counts claims; import_worker.py marks a row failed (with the last error it
+-- noted) once it has been claimed more than --max-attempts times.
+CREATE OR REPLACE FUNCTION claim_pending_imports(
+    p_limit       INTEGER DEFAULT 50,
+    p_stale_after INTERVAL DEFAULT '10 minutes'
+)
+RETURNS SETOF pending_imports AS $$
+    UPDATE pending_imports p
+    SET status = 'processing', claimed_at = now(), attempts = p.attempts + 1
+    WHERE p.id IN (
+        SELECT q.id
+        FROM pending_imports q
+        WHERE q.status = 'pending'
+           OR (q.status = 'processing' AND q.claimed_at < now() - p_stale_after)
+        ORDER BY q.created_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING p.*;
+$$ LANGUAGE sql VOLATILE SECURITY INVOKER;
+
+-- p_recipes:  [{"import_id", "id", "title", "source_url", "image_url",
+--               "instructions", "servings", "created_by",
+--               "ingredients": [{"name", "quantity", "unit", "note"}, ...]}, ...]
+-- p_failures: [{"import_id", "error"}, ...]
+-- Inserts every recipe and ingredient with one INSERT each and marks the
+-- imports processed/failed. Recipe ids are generated by the worker.
+CREATE OR REPLACE FUNCTION finish_pending_imports(
+    p_recipes  JSONB DEFAULT '[]',
+    p_failures JSONB DEFAULT '[]'
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO recipes (id, title, source_url, image_url, instructions, servings, created_by, is_public)
+    SELECT r.id, r.title, r.source_url, r.image_url, r.instructions, COALESCE(r.servings, 4), r.created_by, false
+    FROM jsonb_to_recordset(p_recipes) AS r(
+        id UUID, title TEXT, source_url TEXT, image_url TEXT,
+        instructions TEXT, servings INTEGER, created_by UUID
+    );
+
+    INSERT INTO recipe_ingredients (recipe_id, name, quantity, unit, note)
+    SELECT (r->>'id')::uuid, i.name, i.quantity, i.unit, i.note
+    FROM jsonb_array_elements(p_recipes) AS r,
+         jsonb_to_recordset(COALESCE(r->'ingredients', '[]')) AS i(
+             name TEXT, quantity NUMERIC, unit TEXT, note TEXT
+         );
+
+    UPDATE pending_imports p
+    SET status = 'processed', recipe_id = (r->>'id')::uuid, error = NULL
+    FROM jsonb_array_elements(p_recipes) AS r
+    WHERE p.id = (r->>'import_id')::uuid;
+
+    UPDATE pending_imports p
+    SET status = 'failed', error = f->>'error'
+    FROM jsonb_array_elements(p_failures) AS f
+    WHERE p.id = (f->>'import_id')::uuid;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+REVOKE EXECUTE ON FUNCTION claim_pending_imports(INTEGER, INTERVAL) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION finish_pending_imports(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_pending_imports(INTEGER, INTERVAL) TO service_role;
+GRANT EXECUTE ON FUNCTION finish_pending_imports(JSONB, JSONB) TO service_role;
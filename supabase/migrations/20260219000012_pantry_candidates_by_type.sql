@@ -0,0 +1,89 @@
+-- Alias-equivalent rows for the pantry add-item dedupe.
+-- p_equivalents only carries exact alias names, but the Python matcher also
+-- resolves names that end in a multi-word alias ("Organic Whole Milk" -> Milk).
+-- Those rows used to come back only if trigram similarity put them in the
+-- top p_limit, so the dedupe could miss them and insert a duplicate. The app
+-- now passes the new name's ingredient type and the function returns every
+-- row whose name is, or ends in, one of that type's names.
+
+-- Same tokens as ingredient_aliases.tokenize(), joined by single spaces
+CREATE OR REPLACE FUNCTION ingredient_tokens(p_name TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(lower(p_name), '[^a-z0-9%]+', ' ', 'g'));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Indexed so the type branch below is a lookup, not a per-row function call:
+-- btree for whole-name equality, trigram GIN for the "ends in" LIKE.
+ALTER TABLE pantry_items
+    ADD COLUMN IF NOT EXISTS specific_name_tokens TEXT
+    GENERATED ALWAYS AS (ingredient_tokens(specific_name)) STORED;
+
+CREATE INDEX IF NOT EXISTS pantry_items_household_tokens_idx
+    ON pantry_items (household_id, specific_name_tokens);
+
+CREATE INDEX IF NOT EXISTS pantry_items_tokens_trgm_idx
+    ON pantry_items USING GIN (specific_name_tokens extensions.gin_trgm_ops);
+
+DROP FUNCTION IF EXISTS pantry_match_candidates(UUID, TEXT, TEXT[], INTEGER);
+
+-- Each way a row can match is its own indexed branch (exact name, named in
+-- p_equivalents, a name of p_ingredient_type_id whole or as a multi-word
+-- suffix like AliasIndex.canonical(), trigram similarity), and only their
+-- union is ranked: exact first, then equivalents, then by similarity.
+-- Exact and equivalent rows are all returned even past p_limit, since any
+-- of them is a match.
+CREATE OR REPLACE FUNCTION pantry_match_candidates(
+    p_household_id       UUID,
+    p_name               TEXT,
+    p_equivalents        TEXT[]  DEFAULT '{}',
+    p_limit              INTEGER DEFAULT 5,
+    p_ingredient_type_id UUID    DEFAULT NULL
+)
+RETURNS SETOF pantry_items AS $$
+    WITH type_names AS (
+        SELECT ingredient_tokens(name) AS tokens FROM ingredient_types WHERE id = p_ingredient_type_id
+        UNION
+        SELECT ingredient_tokens(alias) FROM ingredient_aliases WHERE ingredient_type_id = p_ingredient_type_id
+    ),
+    hits (id, kind) AS (
+        SELECT p.id, 0 FROM pantry_items p
+        WHERE p.household_id = p_household_id AND p.specific_name_norm = lower(btrim(p_name))
+        UNION ALL
+        SELECT p.id, 1 FROM pantry_items p
+        WHERE p.household_id = p_household_id AND p.specific_name_norm = ANY(p_equivalents)
+        UNION ALL
+        SELECT p.id, 1 FROM pantry_items p JOIN type_names t ON p.specific_name_tokens = t.tokens
+        WHERE p.household_id = p_household_id
+        UNION ALL
+        -- Tokens are [a-z0-9%], so % is the only LIKE metacharacter to escape
+        SELECT p.id, 1 FROM pantry_items p
+        JOIN type_names t
+          ON t.tokens LIKE '% %'
+         AND p.specific_name_tokens LIKE '% ' || replace(t.tokens, '%', '\%')
+        WHERE p.household_id = p_household_id
+        UNION ALL
+        SELECT p.id, 2 FROM pantry_items p
+        WHERE p.household_id = p_household_id
+          AND p.specific_name_norm OPERATOR(extensions.%) lower(btrim(p_name))
+    ),
+    ranked AS (
+        SELECT
+            p.id,
+            min(h.kind) AS kind,
+            row_number() OVER (
+                ORDER BY min(h.kind), extensions.similarity(p.specific_name_norm, lower(btrim(p_name))) DESC
+            ) AS rank
+        FROM hits h
+        JOIN pantry_items p ON p.id = h.id
+        GROUP BY p.id, p.specific_name_norm
+    )
+    SELECT p.*
+    FROM ranked r
+    JOIN pantry_items p ON p.id = r.id
+    WHERE r.kind < 2 OR r.rank <= p_limit
+    ORDER BY r.rank;
+$$ LANGUAGE sql STABLE SECURITY INVOKER
+SET pg_trgm.similarity_threshold = 0.2;
+
+GRANT EXECUTE ON FUNCTION ingredient_tokens(TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION pantry_match_candidates(UUID, TEXT, TEXT[], INTEGER, UUID) TO authenticated;
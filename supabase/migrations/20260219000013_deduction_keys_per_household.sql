@@ -0,0 +1,60 @@
+-- Idempotency keys for pantry deductions are scoped to the household.
+-- With a global primary key, a key that collided with another household's
+-- row (hidden by RLS) failed the insert instead of replaying the log.
+
+ALTER TABLE pantry_deductions DROP CONSTRAINT pantry_deductions_pkey;
+ALTER TABLE pantry_deductions ADD PRIMARY KEY (household_id, idempotency_key);
+
+-- Same as 20260219000005, but the replay lookup and the lock are per
+-- (household, key).
+CREATE OR REPLACE FUNCTION deduct_pantry_items(
+    p_household_id    UUID,
+    p_deductions      JSONB,
+    p_idempotency_key TEXT
+)
+RETURNS JSONB AS $$
+DECLARE
+    d       JSONB;
+    item    pantry_items%ROWTYPE;
+    new_qty NUMERIC;
+    v_log   JSONB := '[]'::jsonb;
+BEGIN
+    -- Concurrent calls with the same key queue here; the second one then replays.
+    PERFORM pg_advisory_xact_lock(hashtext(p_household_id::text || ':' || p_idempotency_key));
+
+    SELECT pd.log INTO v_log
+    FROM pantry_deductions pd
+    WHERE pd.household_id = p_household_id
+      AND pd.idempotency_key = p_idempotency_key;
+    IF FOUND THEN
+        RETURN v_log;
+    END IF;
+    v_log := '[]'::jsonb;
+
+    FOR d IN SELECT * FROM jsonb_array_elements(p_deductions) LOOP
+        SELECT * INTO item
+        FROM pantry_items
+        WHERE id = (d->>'pantry_item_id')::uuid
+          AND household_id = p_household_id
+        FOR UPDATE;
+        -- Already used up by an earlier ingredient in this batch
+        CONTINUE WHEN NOT FOUND;
+
+        new_qty := COALESCE(item.quantity, 0) - (d->>'amount')::numeric;
+        IF new_qty <= 0 THEN
+            DELETE FROM pantry_items WHERE id = item.id;
+            v_log := v_log || to_jsonb('Used all ' || item.specific_name);
+        ELSE
+            UPDATE pantry_items
+            SET quantity = round(new_qty, 2), updated_at = now()
+            WHERE id = item.id;
+            v_log := v_log || to_jsonb(d->>'label');
+        END IF;
+    END LOOP;
+
+    INSERT INTO pantry_deductions (idempotency_key, household_id, log)
+    VALUES (p_idempotency_key, p_household_id, v_log);
+
+    RETURN v_log;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
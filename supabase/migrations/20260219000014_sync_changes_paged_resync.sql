@@ -0,0 +1,58 @@
+-- Full resyncs of the pantry snapshot page through pantry_items instead of
+-- receiving the whole pantry in one sync_changes response.
+-- The app first calls sync_changes(..., p_pantry => false) for the cursor and
+-- the substitutions, then reads pantry_items by id keyset
+-- (utils/pagination.iter_pages). Rows written or deleted while it pages have
+-- updated_at / deleted_at after that cursor, so the next delta picks them up.
+
+-- Serves WHERE household_id = $1 AND id > $2 ORDER BY id LIMIT $3
+CREATE INDEX IF NOT EXISTS pantry_items_household_id_idx
+    ON pantry_items (household_id, id);
+
+DROP FUNCTION IF EXISTS sync_changes(UUID, TIMESTAMPTZ);
+
+-- Same as 20260219000009, plus p_pantry: false leaves pantry_items empty.
+CREATE OR REPLACE FUNCTION sync_changes(
+    p_household_id UUID,
+    p_since        TIMESTAMPTZ DEFAULT NULL,
+    p_pantry       BOOLEAN     DEFAULT true
+)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'synced_at', now(),
+        'pantry_items', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', p.id,
+                'specific_name', p.specific_name,
+                'quantity', p.quantity,
+                'unit', p.unit,
+                'updated_at', p.updated_at
+            ))
+            FROM pantry_items p
+            WHERE p_pantry
+              AND p.household_id = p_household_id
+              AND (p_since IS NULL OR p.updated_at > p_since)
+        ), '[]'::jsonb),
+        'ingredient_substitutions', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', s.id,
+                'household_id', s.household_id,
+                'ingredient_a', s.ingredient_a,
+                'ingredient_b', s.ingredient_b,
+                'updated_at', s.updated_at
+            ))
+            FROM ingredient_substitutions s
+            WHERE (s.household_id IS NULL OR s.household_id = p_household_id)
+              AND (p_since IS NULL OR s.updated_at > p_since)
+        ), '[]'::jsonb),
+        'deleted', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('table_name', t.table_name, 'row_id', t.row_id))
+            FROM sync_tombstones t
+            WHERE p_since IS NOT NULL
+              AND (t.household_id IS NULL OR t.household_id = p_household_id)
+              AND t.deleted_at > p_since
+        ), '[]'::jsonb)
+    );
+$$ LANGUAGE sql STABLE SECURITY INVOKER;
+
+GRANT EXECUTE ON FUNCTION sync_changes(UUID, TIMESTAMPTZ, BOOLEAN) TO authenticated;
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import import_worker
+
+
+class FakeQueue:
+    """Just enough of the service-role client for run_batch()."""
+
+    def __init__(self, rows, fail_finish=False):
+        self.rows = {row["id"]: dict(row) for row in rows}
+        self.fail_finish = fail_finish
+        self.finished = []
+
+    def rpc(self, name, params):
+        def execute():
+            if name == "claim_pending_imports":
+                claimed = []
+                for row in self.rows.values():
+                    if row["status"] == "pending":
+                        row["status"] = "processing"
+                        row["attempts"] += 1
+                        claimed.append(dict(row))
+                return SimpleNamespace(data=claimed)
+            if self.fail_finish:
+                raise ConnectionError("database went away")
+            self.finished.append(params)
+            for failure in params["p_failures"]:
+                self.rows[failure["import_id"]].update(status="failed", error=failure["error"])
+            return SimpleNamespace(data=None)
+
+        return SimpleNamespace(execute=execute)
+
+    def table(self, name):
+        queue = self
+
+        class Update:
+            def __init__(self, values):
+                self.values = values
+
+            def in_(self, column, ids):
+                self.ids = ids
+                return self
+
+            def execute(self):
+                for import_id in self.ids:
+                    queue.rows[import_id].update(self.values)
+
+        return SimpleNamespace(update=Update)
+
+    def reclaim(self):
+        """What claim_pending_imports does once the lease of 'processing' rows expires."""
+        for row in self.rows.values():
+            if row["status"] == "processing":
+                row["status"] = "pending"
+
+
+def _row(import_id, attempts=0, error=None):
+    return {"id": import_id, "status": "pending", "attempts": attempts, "error": error, "raw_data": None}
+
+
+def test_failed_batch_notes_its_error_on_the_rows():
+    sb = FakeQueue([_row("a")], fail_finish=True)
+    with ThreadPoolExecutor(1) as pool, pytest.raises(ConnectionError):
+        import_worker.run_batch(sb, pool, 10)
+    assert sb.rows["a"]["status"] == "processing"
+    assert "database went away" in sb.rows["a"]["error"]
+
+
+def test_row_past_max_attempts_is_failed_with_its_last_error():
+    sb = FakeQueue([_row("a")], fail_finish=True)
+    with ThreadPoolExecutor(1) as pool:
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                import_worker.run_batch(sb, pool, 10, max_attempts=3)
+            sb.reclaim()
+
+        sb.fail_finish = False
+        stats = import_worker.run_batch(sb, pool, 10, max_attempts=3)
+
+    row = sb.rows["a"]
+    assert row["status"] == "failed"
+    assert row["error"].startswith("gave up after 3 attempts; last error: batch failed:")
+    assert "database went away" in row["error"]
+    assert stats["failed"] == 1 and stats["processed"] == 0
+    assert sb.finished[-1]["p_recipes"] == []
+
+
+def test_row_under_max_attempts_is_parsed_again():
+    sb = FakeQueue([_row("a", attempts=1, error="batch failed: timeout")])
+    with ThreadPoolExecutor(1) as pool:
+        import_worker.run_batch(sb, pool, 10, max_attempts=3)
+    # Parsed (and failed on its empty raw_data) rather than given up on
+    assert sb.rows["a"]["error"] == "no JSON-LD data"
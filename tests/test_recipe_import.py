@@ -0,0 +1,17 @@
+import pytest
+
+from utils.recipe_import import parse_ingredient_line
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("1 1/2 cups flour, sifted", {"name": "flour", "quantity": 1.5, "unit": "cup", "note": "sifted"}),
+    ("1 (14 oz) can tomatoes", {"name": "tomatoes", "quantity": 1.0, "unit": "can", "note": "14 oz"}),
+    ("1 cup (250 ml) milk", {"name": "milk", "quantity": 1.0, "unit": "cup", "note": "250 ml"}),
+    ("1 cup (250 ml) milk, warmed", {"name": "milk", "quantity": 1.0, "unit": "cup", "note": "250 ml; warmed"}),
+    ("1 can", {"name": "can", "quantity": 1.0, "unit": "can", "note": None}),
+    ("2 tablespoons", {"name": "tbsp", "quantity": 2.0, "unit": "tbsp", "note": None}),
+    ("½ cup of sugar", {"name": "sugar", "quantity": 0.5, "unit": "cup", "note": None}),
+    ("salt", {"name": "salt", "quantity": None, "unit": None, "note": None}),
+])
+def test_parse_ingredient_line(line, expected):
+    assert parse_ingredient_line(line) == expected
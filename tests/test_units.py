@@ -0,0 +1,23 @@
+import pytest
+
+from utils.units import canonical_unit, convert
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Tablespoons", "tbsp"),
+    ("fl. oz", "fl oz"),
+    ("ct", "count"),
+    ("cts", "count"),
+    ("glasses", "glass"),
+    ("leaves", "leaf"),
+    ("cloves", "clove"),
+    ("eggs", "eggs"),
+])
+def test_canonical_unit(text, expected):
+    assert canonical_unit(text) == expected
+
+
+def test_convert_across_dimensions():
+    assert convert(2, "cups", "ml") == pytest.approx(473.176)
+    assert convert(1, "cup", "g") is None
+    assert convert(3, "glasses", "glass") == 3
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+"""
+Process-wide caches that can be invalidated one key at a time.
+
+st.cache_data can only be cleared wholesale on the Streamlit versions we
+support, so a write by one household would evict every other household's
+entry. These caches live at module level (shared by all sessions in the
+server process, like st.cache_resource) and are keyed by household.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after ttl seconds.
+
+    get_or_load() runs the loader outside the lock, so a slow query for one
+    household never blocks reads for another.
+    """
+
+    def __init__(self, ttl: float | None = 300, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """Snapshot of the unexpired (key, value) pairs, without touching LRU order or counters."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (expires, value) in self._entries.items()
+                if self.ttl is None or expires > now
+            ]
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        """Hit/miss counters and current size, for sizing the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class VersionStamps:
+    """
+    Per-key write counters used to stamp cache keys.
+
+    A writer bumps its household after changing data; readers fold stamp()
+    into their cache keys, so entries computed against older data are simply
+    never looked up again and age out of the LRU. bump_all() is for writes
+    that affect every household (e.g. a global substitution pair).
+    """
+
+    def __init__(self):
+        self._base = 0
+        self._counts: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def stamp(self, key: Hashable) -> tuple[int, int]:
+        with self._lock:
+            return self._base, self._counts.get(key, 0)
+
+    def bump(self, key: Hashable) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def bump_all(self) -> None:
+        with self._lock:
+            self._base += 1
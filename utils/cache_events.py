@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+"""
+Push-based invalidation of per-household caches.
+
+Pages call watch_household() once a household is known. A background
+listener then subscribes to that household's Postgres changes on
+pantry_items, ingredient_substitutions and sync_tombstones (deletes) through
+Supabase Realtime. Each change invalidates only that household's entries:
+the match memo and pantry snapshot (bump_pantry_version), the substitution
+index (clear_substitution_cache) and the dashboard numbers. While a
+household has a live subscription its pantry snapshot is trusted for
+PANTRY_SNAPSHOT_PUSHED_MAX_AGE instead of re-syncing every few seconds.
+
+REALTIME_INVALIDATION selects the feed:
+    1 (default)  Supabase Realtime over one websocket per household, for at
+                 most REALTIME_MAX_HOUSEHOLDS households at a time; one not
+                 watched for REALTIME_IDLE_TIMEOUT seconds is unsubscribed
+    local        LocalChangeFeed, an in-process stand-in; call emit() to
+                 simulate a change (tests, benchmarks, offline development)
+    0            no feed; caches fall back to their TTLs
+
+Our own writes come back as events too; the second invalidation is harmless.
+Global substitution pairs (household_id NULL) are also watched and clear
+every household's substitution cache.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import pantry_snapshot
+from utils.dashboard import clear_dashboard_stats
+from utils.ingredient_matcher import bump_pantry_version, clear_substitution_cache
+
+MODE = os.getenv("REALTIME_INVALIDATION", "1").strip().lower()
+MAX_HOUSEHOLDS = int(os.getenv("REALTIME_MAX_HOUSEHOLDS", "64"))
+IDLE_TIMEOUT = float(os.getenv("REALTIME_IDLE_TIMEOUT", "900"))
+
+WATCHED_TABLES = ("pantry_items", "ingredient_substitutions", "sync_tombstones")
+
+logger = logging.getLogger("smartpantry.cache_events")
+
+
+def invalidate(household_id: str | None, table: str) -> None:
+    """Drops the cache entries a change to table affects. household_id None means a global row."""
+    if table == "pantry_items" and household_id is not None:
+        bump_pantry_version(household_id)
+    elif table == "ingredient_substitutions":
+        clear_substitution_cache(household_id)
+    else:
+        return
+    if household_id is not None:
+        clear_dashboard_stats(household_id)
+
+
+def apply_change(table: str, record: dict | None, old_record: dict | None = None) -> None:
+    """
+    Routes one change event. A sync_tombstones row stands for a delete from
+    the table it names, since Realtime can't filter deletes by household.
+    """
+    row = record or old_record or {}
+    if table == "sync_tombstones":
+        table = row.get("table_name", "")
+    invalidate(row.get("household_id"), table)
+
+
+def _on_payload(payload: dict) -> None:
+    data = payload.get("data") or {}
+    try:
+        apply_change(data.get("table", ""), data.get("record"), data.get("old_record"))
+    except Exception:
+        logger.exception("cache invalidation failed for %s", data.get("table"))
+
+
+class LocalChangeFeed:
+    """In-process stand-in for RealtimeListener: emit() delivers a change to watched households."""
+
+    def __init__(self):
+        self.watched: set[str] = set()
+
+    def watch(self, household_id: str, access_token: str | None = None) -> None:
+        self.watched.add(household_id)
+        pantry_snapshot.set_pushed(household_id, True)
+
+    def emit(self, table: str, record: dict, event: str = "UPDATE") -> None:
+        household_id = record.get("household_id")
+        if household_id is None or household_id in self.watched:
+            key = "old_record" if event == "DELETE" else "record"
+            _on_payload({"data": {"table": table, "type": event, key: record}})
+
+    def close(self) -> None:
+        for household_id in self.watched:
+            pantry_snapshot.set_pushed(household_id, False)
+        self.watched.clear()
+
+
+class RealtimeListener:
+    """
+    Supabase Realtime subscriptions, one websocket and channel per household,
+    run on an asyncio loop in a daemon thread. watch() returns immediately;
+    the subscription (or its failure) happens in the background.
+
+    Subscriptions are kept in LRU order of their last watch(). Past
+    max_households the least recently watched one is unsubscribed, and a
+    sweep unsubscribes any not watched within idle_timeout, so the process
+    holds sockets only for households someone is actually looking at.
+    """
+
+    def __init__(
+        self, url: str, anon_key: str, max_households: int = MAX_HOUSEHOLDS, idle_timeout: float = IDLE_TIMEOUT
+    ):
+        self._url = f"{url.rstrip('/')}/realtime/v1"
+        self._key = anon_key
+        self.max_households = max_households
+        self.idle_timeout = idle_timeout
+        self._clients: OrderedDict = OrderedDict()  # household_id -> (client, last watched)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cache-events", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._sweep(), self._loop)
+
+    def watch(self, household_id: str, access_token: str | None = None) -> None:
+        asyncio.run_coroutine_threadsafe(self._watch(household_id, access_token), self._loop)
+
+    async def _watch(self, household_id: str, access_token: str | None) -> None:
+        from realtime import AsyncRealtimeClient, RealtimeSubscribeStates
+
+        entry = self._clients.get(household_id)
+        if entry is not None:
+            client = entry[0]
+            self._clients[household_id] = (client, time.monotonic())
+            self._clients.move_to_end(household_id)
+            # Keep the channel authorized as members' sessions refresh their JWTs
+            if access_token and access_token != client.access_token:
+                await client.set_auth(access_token)
+            return
+
+        client = AsyncRealtimeClient(self._url, self._key)
+        self._clients[household_id] = (client, time.monotonic())
+        while len(self._clients) > self.max_households:
+            await self._release(next(iter(self._clients)), unsubscribe=True)
+        try:
+            if access_token:
+                await client.set_auth(access_token)
+            channel = client.channel(f"cache:{household_id}")
+            for table in WATCHED_TABLES:
+                channel.on_postgres_changes(
+                    "*", _on_payload, table=table, schema="public", filter=f"household_id=eq.{household_id}"
+                )
+            channel.on_postgres_changes(
+                "*", _on_payload, table="ingredient_substitutions", schema="public", filter="household_id=is.null"
+            )
+
+            def on_state(state, error):
+                if state == RealtimeSubscribeStates.SUBSCRIBED:
+                    pantry_snapshot.set_pushed(household_id, True)
+                else:
+                    # Closed, errored or timed out: drop back to TTLs and resubscribe on the next watch()
+                    logger.warning("realtime channel for %s is %s: %s", household_id, state, error)
+                    asyncio.ensure_future(self._release(household_id, client))
+
+            await channel.subscribe(on_state)
+        except Exception:
+            logger.exception("realtime subscribe failed for %s", household_id)
+            await self._release(household_id, client)
+
+    async def _release(self, household_id: str, client=None, unsubscribe: bool = False) -> None:
+        """
+        Forgets a household's subscription and closes its socket. With client,
+        only if that is still the household's client (a newer watch() may have
+        replaced it).
+        """
+        entry = self._clients.get(household_id)
+        if entry is None or (client is not None and entry[0] is not client):
+            if client is not None:
+                await self._close(household_id, client, unsubscribe)
+            return
+        del self._clients[household_id]
+        pantry_snapshot.set_pushed(household_id, False)
+        await self._close(household_id, entry[0], unsubscribe)
+
+    @staticmethod
+    async def _close(household_id: str, client, unsubscribe: bool) -> None:
+        try:
+            if unsubscribe:
+                await client.remove_all_channels()  # leaves the channel, then closes the socket
+            else:
+                await client.close()
+        except Exception:
+            logger.warning("closing realtime client for %s failed", household_id, exc_info=True)
+
+    async def _sweep(self) -> None:
+        """Unsubscribes households nobody has watched within idle_timeout."""
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 1.0))
+            cutoff = time.monotonic() - self.idle_timeout
+            for household_id in [hh for hh, (_, seen) in self._clients.items() if seen < cutoff]:
+                await self._release(household_id, unsubscribe=True)
+
+
+_listener: RealtimeListener | LocalChangeFeed | None = None
+_listener_lock = threading.Lock()
+
+
+def get_listener() -> RealtimeListener | LocalChangeFeed | None:
+    """The process-wide feed selected by REALTIME_INVALIDATION, or None when disabled."""
+    global _listener
+    if MODE in ("0", "false", "off"):
+        return None
+    with _listener_lock:
+        if _listener is None:
+            if MODE == "local":
+                _listener = LocalChangeFeed()
+            else:
+                url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY")
+                if not url or not key:
+                    return None
+                _listener = RealtimeListener(url, key)
+        return _listener
+
+
+def watch_household(household_id: str, access_token: str | None = None) -> None:
+    """Starts (or re-authorizes) push invalidation for a household. Cheap to call on every render."""
+    listener = get_listener()
+    if listener is not None:
+        listener.watch(household_id, access_token)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+"""
+Dashboard summary numbers.
+
+All cards come from the dashboard_stats RPC in one round trip, cached per
+household for a short TTL so reruns and page switches don't repeat it.
+"""
+
+from utils.cache import TTLCache
+from utils.supabase_client import get_client
+
+_EMPTY_STATS = {
+    "pantry_items": 0,
+    "saved_recipes": 0,
+    "meals_this_week": 0,
+    "shopping_unchecked": 0,
+    "cookable_recipes": 0,
+}
+
+_stats = TTLCache(ttl=30)
+
+
+def _load_dashboard_stats(household_id: str) -> dict:
+    result = get_client().rpc("dashboard_stats", {"p_household_id": household_id}).execute()
+    return {**_EMPTY_STATS, **(result.data or {})}
+
+
+def get_dashboard_stats(household_id: str) -> dict:
+    """
+    Returns the household's dashboard aggregates:
+        {pantry_items, saved_recipes, meals_this_week, shopping_unchecked, cookable_recipes}
+    """
+    return _stats.get_or_load(household_id, lambda: _load_dashboard_stats(household_id))
+
+
+def clear_dashboard_stats(household_id: str) -> None:
+    """Drops the cached numbers for one household, e.g. right after it writes."""
+    _stats.invalidate(household_id)
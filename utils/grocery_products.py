@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+"""
+Store product lookup for shopping-list lines.
+
+resolve_products() maps ingredient names to store products through a
+pluggable ProductClient. Names are keyed by their normalized tokens (so
+"Olive Oil" and "olive-oil" share an entry), looked up in a persistent
+SQLite cache first, and only the misses go to the store, GROCERY_LOOKUP_WORKERS
+at a time. A 40-line list therefore costs one cache read plus a lookup per
+ingredient the cache hasn't seen within GROCERY_CACHE_TTL, all in parallel.
+Failed lookups aren't cached; "no product found" is, for NOT_FOUND_TTL.
+
+The client comes from GROCERY_CLIENT: "stub" (default) is StubProductClient,
+a local client for development and tests that never touches the network;
+anything else is a "package.module:ClassName" path to a class implementing
+ProductClient, constructed with no arguments (e.g. a wrapper over a store
+SDK or API).
+"""
+
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Protocol
+
+from utils.ingredient_aliases import tokenize
+from utils.supabase_client import get_client
+
+CACHE_PATH = os.getenv("GROCERY_CACHE_PATH", os.path.join(".cache", "grocery_products.sqlite3"))
+CACHE_TTL = float(os.getenv("GROCERY_CACHE_TTL", str(7 * 24 * 3600)))
+NOT_FOUND_TTL = float(os.getenv("GROCERY_NOT_FOUND_TTL", "3600"))
+WORKERS = int(os.getenv("GROCERY_LOOKUP_WORKERS", "8"))
+
+logger = logging.getLogger("smartpantry.grocery")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    store      TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    product    TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (store, key)
+);
+"""
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+
+class ProductClient(Protocol):
+    """A store's product search. store names the cache partition."""
+
+    store: str
+
+    def search(self, query: str) -> dict | None:
+        """The best product for an ingredient query as {name, product_id, price, size, url}, or None."""
+
+
+class StubProductClient:
+    """Answers every query locally with a placeholder product linking to a store search."""
+
+    store = "stub"
+
+    def __init__(self, search_url: str = "https://www.safeway.com/shop/search-results.html?q={}"):
+        self.search_url = search_url
+        self.calls = 0
+
+    def search(self, query: str) -> dict | None:
+        self.calls += 1
+        if not query:
+            return None
+        return {
+            "name": query.title(),
+            "product_id": f"stub:{query.replace(' ', '-')}",
+            "price": None,
+            "size": None,
+            "url": self.search_url.format(urllib.parse.quote_plus(query)),
+        }
+
+
+def get_product_client() -> ProductClient:
+    """The client GROCERY_CLIENT names (see the module docstring)."""
+    spec = os.getenv("GROCERY_CLIENT", "stub")
+    if spec == "stub":
+        return StubProductClient()
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def product_key(name: str) -> str:
+    """Cache key for an ingredient name: its lowercase word tokens."""
+    return " ".join(tokenize(name))
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        if CACHE_PATH != ":memory:":
+            os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def _cached(store: str, keys: list[str]) -> dict[str, dict | None]:
+    now = time.time()
+    found = {}
+    with _lock:
+        conn = _connection()
+        for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, product, fetched_at FROM products"
+                f" WHERE store = ? AND key IN ({','.join('?' * len(chunk))})",
+                (store, *chunk),
+            ).fetchall()
+            for key, product, fetched_at in rows:
+                if now - fetched_at < (CACHE_TTL if product is not None else NOT_FOUND_TTL):
+                    found[key] = json.loads(product) if product is not None else None
+    return found
+
+
+def _store(store: str, results: dict[str, dict | None]) -> None:
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO products (store, key, product, fetched_at) VALUES (?, ?, ?, ?)",
+                [
+                    (store, key, json.dumps(product) if product is not None else None, now)
+                    for key, product in results.items()
+                ],
+            )
+
+
+def resolve_products(
+    names: list[str], client: ProductClient | None = None, workers: int = WORKERS
+) -> dict[str, dict | None]:
+    """
+    Returns {name: product or None} for every name. Each distinct key is
+    looked up at most once, from the cache when fresh, else through the
+    client with at most workers lookups in flight.
+    """
+    client = client or get_product_client()
+    keys = {name: product_key(name) for name in names}
+    unique = sorted(set(keys.values()) - {""})
+    results = _cached(client.store, unique)
+
+    missing = [key for key in unique if key not in results]
+    if missing:
+        def lookup(key: str):
+            try:
+                return key, client.search(key), True
+            except Exception as e:
+                logger.warning("product lookup failed for %r: %s", key, e)
+                return key, None, False
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing))), thread_name_prefix="grocery") as pool:
+            for key, product, ok in pool.map(lookup, missing):
+                results[key] = product
+                if ok:
+                    fetched[key] = product
+        if fetched:
+            _store(client.store, fetched)
+
+    return {name: results.get(key) for name, key in keys.items()}
+
+
+def resolve_shopping_list(meal_plan_id: str, client: ProductClient | None = None) -> list[dict]:
+    """
+    The plan's unchecked shopping_list_items rows, each with a "product" key
+    (the resolved store product or None).
+    """
+    rows = (
+        get_client()
+        .table("shopping_list_items")
+        .select("id, specific_name, quantity_needed, unit, is_checked, ingredient_types(name)")
+        .eq("meal_plan_id", meal_plan_id)
+        .eq("is_checked", False)
+        .execute()
+    ).data or []
+
+    def name_of(row: dict) -> str:
+        return row.get("specific_name") or (row.get("ingredient_types") or {}).get("name") or ""
+
+    products = resolve_products([name_of(row) for row in rows], client)
+    return [{**row, "product": products.get(name_of(row))} for row in rows]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+"""
+Canonical ingredient names from the ingredient_types / ingredient_aliases taxonomy.
+
+AliasIndex resolves a free-text name to an ingredient_type_id:
+  1. The whole name is a type name or an alias ("Goat Milk" -> Milk), by hash lookup
+  2. The name ends in a multi-word type name or alias
+     ("Organic Unsalted Butter" -> Butter), by walking a token trie from the last word
+
+Only multi-word entries are matched as a suffix, so "Garlic Salt" doesn't become
+Salt and "Butter Beans" doesn't become Butter. Names are compared as their
+lowercase word tokens, so punctuation and spacing don't matter.
+
+The taxonomy is global and changes only with migrations, so one index is
+shared by every household and rebuilt at most once per TTL.
+"""
+
+import re
+
+from utils.cache import TTLCache
+
+_TOKEN_RE = re.compile(r"[a-z0-9%]+")
+
+_indexes = TTLCache(ttl=3600, max_entries=1)
+
+_END = ""  # trie key marking "an entry ends here"; never a token
+
+
+def tokenize(name: str) -> tuple[str, ...]:
+    """Lowercase word tokens of a name, e.g. "Half-and-Half" -> ("half", "and", "half")."""
+    return tuple(_TOKEN_RE.findall(name.lower()))
+
+
+class AliasIndex:
+    """
+    Type names and aliases keyed by their joined tokens, plus a trie over the
+    reversed tokens of every multi-word entry for suffix matches.
+
+    Type names win over aliases spelled the same way.
+    """
+
+    def __init__(self, types: list, aliases: list):
+        self._type_of: dict[str, str] = {}
+        self._trie: dict = {}
+        self._names: dict[str, list[str]] = {}
+        self._memo: dict[str, str | None] = {}
+
+        entries = [(t["name"], t["id"]) for t in types]
+        entries += [(a["alias"], a["ingredient_type_id"]) for a in aliases]
+        for name, type_id in entries:
+            tokens = tokenize(name or "")
+            key = " ".join(tokens)
+            if not key or key in self._type_of:
+                continue
+            self._type_of[key] = type_id
+            self._names.setdefault(type_id, []).append(name.strip().lower())
+            if len(tokens) > 1:
+                node = self._trie
+                for token in reversed(tokens):
+                    node = node.setdefault(token, {})
+                node[_END] = type_id
+
+    def __len__(self) -> int:
+        return len(self._type_of)
+
+    def canonical(self, name: str) -> str | None:
+        """ingredient_type_id a name resolves to, or None if the taxonomy doesn't know it."""
+        type_id = self._memo.get(name, _END)
+        if type_id is not _END:
+            return type_id
+
+        tokens = tokenize(name)
+        type_id = self._type_of.get(" ".join(tokens))
+        if type_id is None:
+            # Longest multi-word entry the name ends with
+            node = self._trie
+            for token in reversed(tokens):
+                node = node.get(token)
+                if node is None:
+                    break
+                type_id = node.get(_END, type_id)
+
+        if len(self._memo) < 100_000:
+            self._memo[name] = type_id
+        return type_id
+
+    def names_of(self, type_id: str | None) -> list[str]:
+        """Lowercased type name and aliases for a type id; empty for None or unknown ids."""
+        return self._names.get(type_id, []) if type_id is not None else []
+
+
+def _load_alias_index() -> AliasIndex:
+    # Imported here so AliasIndex stays usable without Streamlit (see utils.matching)
+    from utils.supabase_client import get_client
+
+    sb = get_client()
+    types = sb.table("ingredient_types").select("id, name").execute().data or []
+    aliases = sb.table("ingredient_aliases").select("alias, ingredient_type_id").execute().data or []
+    return AliasIndex(types, aliases)
+
+
+def get_alias_index() -> AliasIndex:
+    """The shared AliasIndex, loaded in two queries and rebuilt at most hourly."""
+    return _indexes.get_or_load(None, _load_alias_index)
+
+
+def clear_alias_index() -> None:
+    """Drops the cached index, e.g. after editing the taxonomy."""
+    _indexes.clear()
@@ -1,85 +1,270 @@
 from __future__ import annotations
 
 """
-Ingredient matching and pantry diff utilities.
-
-Matching order for any two ingredient names:
-  1. Exact match (case-insensitive)
-  2. Either name appears in a household substitution pair
-  3. Fuzzy match via token_sort_ratio >= FUZZY_THRESHOLD
-
-Both strings are lowercased before comparison — rapidfuzz scores differ
-meaningfully by case (e.g. "Goat Milk" vs "goat milk" = 77 without lowering).
+Ingredient matching and pantry diffs against a household's data.
+
+The matching itself lives in utils.matching, which works on plain data and
+doesn't import Streamlit or Supabase. This module is the app-facing adapter
+over it: it loads pantries (from utils.pantry_snapshot), substitution pairs
+and the alias taxonomy, caches them per household, memoizes match results,
+and applies deductions through Supabase. Its matching functions take the
+same arguments as utils.matching's, but a missing substitutions or aliases
+argument means the global pairs and the shared taxonomy rather than none.
 """
 
+import threading
+import uuid
+
 import streamlit as st
-from rapidfuzz.fuzz import token_sort_ratio
+
+from utils import matching, page_data, pantry_snapshot
+from utils.cache import TTLCache, VersionStamps
+from utils.ingredient_aliases import AliasIndex, get_alias_index
+from utils.match_blocking import NameBlocks
+# Core names are re-exported so pages and utils modules keep importing them from here
+from utils.matching import (
+    FUZZY_THRESHOLD,
+    SubstitutionIndex,
+    coverage,
+    ingredient_name,
+    normalize_name,
+    plan_deductions,
+    with_base_quantity,
+)
 from utils.supabase_client import get_client
 
-FUZZY_THRESHOLD = 82
+_UNMATCHED = object()
+_COOK_KEYS = "_cook_action_keys"
+
+
+# One entry per household (None = global pairs only), invalidated per household.
+_substitution_rows = TTLCache(ttl=300)
+_substitution_indexes = TTLCache(ttl=300)
+
+# Bumped by every write path so memoized match results keyed on them go stale.
+_pantry_versions = VersionStamps()
+_substitution_versions = VersionStamps()
+
+# (household_id, pantry stamp, substitution stamp, snapshot generation,
+# normalized needle) -> matched specific_name or None. Pantry writes made
+# outside this process (e.g. the web app) arrive as a new snapshot generation;
+# the TTL bounds staleness for everything else.
+_match_results = TTLCache(ttl=300, max_entries=20_000)
 
+# household_id -> (lock, NameBlocks over its normalized pantry names). The
+# index follows the pantry by adding and removing only the names that changed.
+_pantry_blocks = TTLCache(ttl=3600, max_entries=256)
 
-@st.cache_data(ttl=300)
-def get_substitutions() -> list:
-    """Returns all substitution pairs as a list of {id, household_id, ingredient_a, ingredient_b}."""
+
+def _load_substitutions(household_id: str | None) -> list:
+    if household_id is not None:
+        return pantry_snapshot.substitution_rows(household_id)
     sb = get_client()
-    result = (
-        sb.table("ingredient_substitutions")
-        .select("id, household_id, ingredient_a, ingredient_b")
-        .execute()
+    query = sb.table("ingredient_substitutions").select("id, household_id, ingredient_a, ingredient_b")
+    return query.is_("household_id", "null").execute().data or []
+
+
+def get_substitutions(household_id: str | None = None) -> list:
+    """
+    Returns the substitution pairs that apply to a household — global pairs
+    (NULL household_id) plus its own — as {id, household_id, ingredient_a, ingredient_b}.
+    With no household, only the global pairs.
+    """
+    return _substitution_rows.get_or_load(household_id, lambda: _load_substitutions(household_id))
+
+
+def get_substitution_index(household_id: str | None = None) -> SubstitutionIndex:
+    """Index over get_substitutions(household_id), rebuilt once per cache generation."""
+    return _substitution_indexes.get_or_load(
+        household_id, lambda: SubstitutionIndex(get_substitutions(household_id))
     )
-    return result.data or []
 
 
-def names_match(a: str, b: str, substitutions: list | None = None) -> bool:
+def clear_substitution_cache(household_id: str | None = None) -> None:
     """
-    Returns True if a and b refer to the same ingredient via:
-      1. Exact match (case-insensitive)
-      2. Either order appears in a substitution pair
-      3. Fuzzy token_sort_ratio >= FUZZY_THRESHOLD
+    Drops one household's cached substitution rows and index. Call after that
+    household writes a pair; other households keep their entries. With no
+    household (a global pair changed), every entry is dropped.
     """
-    a_low = a.strip().lower()
-    b_low = b.strip().lower()
+    if household_id is None:
+        _substitution_rows.clear()
+        _substitution_indexes.clear()
+        _substitution_versions.bump_all()
+    else:
+        _substitution_rows.invalidate(household_id)
+        _substitution_indexes.invalidate(household_id)
+        _substitution_versions.bump(household_id)
+    pantry_snapshot.mark_stale(household_id)
+
+
+def bump_pantry_version(household_id: str) -> None:
+    """Marks a household's pantry as changed. Call after every pantry_items write."""
+    _pantry_versions.bump(household_id)
+    pantry_snapshot.mark_stale(household_id)
+
 
-    if a_low == b_low:
-        return True
+def match_cache_info() -> dict:
+    """Hit/miss counters and size of the memoized match results."""
+    return _match_results.info()
 
+
+def _as_index(substitutions: SubstitutionIndex | list | None) -> SubstitutionIndex:
     if substitutions is None:
-        substitutions = get_substitutions()
+        return get_substitution_index()
+    if isinstance(substitutions, SubstitutionIndex):
+        return substitutions
+    return SubstitutionIndex(substitutions)
 
-    for pair in substitutions:
-        pa = pair["ingredient_a"].strip().lower()
-        pb = pair["ingredient_b"].strip().lower()
-        if (a_low in (pa, pb)) and (b_low in (pa, pb)):
-            return True
 
-    return token_sort_ratio(a_low, b_low) >= FUZZY_THRESHOLD
+def _aliases(aliases: AliasIndex | None) -> AliasIndex:
+    return get_alias_index() if aliases is None else aliases
 
 
-def find_match(needle: str, name_list: list[str], substitutions: list | None = None) -> str | None:
+def names_match(
+    a: str,
+    b: str,
+    substitutions: SubstitutionIndex | list | None = None,
+    aliases: AliasIndex | None = None,
+) -> bool:
     """
-    Returns the first name in name_list that matches needle, or None.
-    name_list should be strings (e.g. specific_name values from pantry).
+    utils.matching.names_match() with app defaults: None substitutions means
+    the global pairs, None aliases the shared get_alias_index(). Pass a
+    SubstitutionIndex when calling in a loop.
     """
-    if substitutions is None:
-        substitutions = get_substitutions()
-    for name in name_list:
-        if names_match(needle, name, substitutions):
-            return name
-    return None
+    return matching.names_match(a, b, _as_index(substitutions), _aliases(aliases))
+
+
+def find_match(
+    needle: str,
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    aliases: AliasIndex | None = None,
+    blocks: NameBlocks | None = None,
+) -> str | None:
+    """utils.matching.find_match() with app defaults (see names_match())."""
+    return matching.find_match(needle, name_list, _as_index(substitutions), _aliases(aliases), blocks)
+
+
+def _match_indices(
+    needles: list[str],
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    workers: int = 1,
+    aliases: AliasIndex | None = None,
+    blocks: NameBlocks | None = None,
+) -> list[int | None]:
+    return matching.match_indices(needles, name_list, _as_index(substitutions), workers, _aliases(aliases), blocks)
+
+
+def match_many(
+    needles: list[str],
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    workers: int = 1,
+    aliases: AliasIndex | None = None,
+) -> list[str | None]:
+    """utils.matching.match_many() with app defaults (see names_match())."""
+    return matching.match_many(needles, name_list, _as_index(substitutions), workers, _aliases(aliases))
 
 
 def get_pantry_items(household_id: str) -> list:
-    """Returns all pantry items for the household as a list of dicts."""
-    sb = get_client()
-    result = (
-        sb.table("pantry_items")
-        .select("id, specific_name, quantity, unit")
-        .eq("household_id", household_id)
-        .order("specific_name")
+    """
+    Returns all pantry items for the household as a list of dicts, each with
+    its quantity also converted to base_quantity/base_unit. Read from the
+    local snapshot (utils.pantry_snapshot), which syncs only what changed.
+    """
+    return [with_base_quantity(row) for row in pantry_snapshot.pantry_rows(household_id)]
+
+
+def find_pantry_item(name: str, household_id: str, candidates: int = 5) -> dict | None:
+    """
+    Returns the household's pantry row matching name, or None, without loading
+    the whole pantry. The pantry_match_candidates RPC returns the few rows that
+    could match (exact, substitution equivalents, every row whose name is or
+    ends in a name of the same ingredient type, closest by trigram
+    similarity) and names_match makes the final call on that short list.
+    """
+    subs = get_substitution_index(household_id)
+    aliases = get_alias_index()
+    low = normalize_name(name)
+    type_id = aliases.canonical(low)
+    rows = (
+        get_client()
+        .rpc("pantry_match_candidates", {
+            "p_household_id": household_id,
+            "p_name": name,
+            "p_equivalents": subs.equivalents(low) + aliases.names_of(type_id),
+            "p_limit": candidates,
+            "p_ingredient_type_id": type_id,
+        })
         .execute()
+    ).data or []
+    return next((row for row in rows if names_match(name, row["specific_name"], subs, aliases)), None)
+
+
+def match_against_pantry(needles: list[str], household_id: str, workers: int = 1) -> tuple[list, list[int | None]]:
+    """
+    Loads the household pantry and resolves each needle to an index into it
+    (or None), like match_many() but memoized per household and pantry /
+    substitution version. Needles already resolved against the current
+    version skip matching entirely; only the rest are scored, each against the
+    candidates of the household's NameBlocks (utils.match_blocking).
+
+    Returns (pantry rows, match index per needle).
+    """
+    # Stamp before reading so a concurrent write can only make this result stale, never mislabeled.
+    stamp = (
+        household_id,
+        _pantry_versions.stamp(household_id),
+        _substitution_versions.stamp(household_id),
+        pantry_snapshot.generation(household_id),
     )
-    return result.data or []
+    pantry = get_pantry_items(household_id)
+    pantry_names = [item["specific_name"] for item in pantry]
+    position = {}
+    for i, name in enumerate(pantry_names):
+        position.setdefault(name, i)
+
+    results: list[int | None] = [None] * len(needles)
+    misses: dict[str, list[int]] = {}
+    for row, needle in enumerate(needles):
+        low = normalize_name(needle)
+        cached = _match_results.get((*stamp, low), _UNMATCHED)
+        if cached is _UNMATCHED:
+            misses.setdefault(low, []).append(row)
+        elif cached is not None:
+            results[row] = position.get(cached)
+
+    if misses:
+        lows = list(misses)
+        lock, blocks = _pantry_blocks.get_or_load(
+            household_id, lambda: (threading.Lock(), NameBlocks(threshold=FUZZY_THRESHOLD))
+        )
+        with lock:
+            blocks.sync(normalize_name(name) for name in pantry_names)
+            found = _match_indices(lows, pantry_names, get_substitution_index(household_id), workers, blocks=blocks)
+        for low, col in zip(lows, found):
+            _match_results.put((*stamp, low), pantry_names[col] if col is not None else None)
+            for row in misses[low]:
+                results[row] = col
+
+    return pantry, results
+
+
+def _recipe_ingredients(recipe_id: str, household_id: str, columns: str) -> list:
+    """
+    Fetches a recipe's ingredient rows while the household's pantry snapshot,
+    substitution index and alias index load alongside it (utils.page_data),
+    so the matching that follows only reads warm caches.
+    """
+    sb = get_client()
+    data = page_data.load(
+        ingredients=lambda: sb.table("recipe_ingredients").select(columns).eq("recipe_id", recipe_id).execute().data,
+        pantry=lambda: pantry_snapshot.sync(household_id),
+        substitutions=lambda: get_substitution_index(household_id),
+        aliases=get_alias_index,
+    )
+    return data["ingredients"] or []
 
 
 def check_recipe_against_pantry(recipe_id: str, household_id: str) -> dict:
@@ -94,78 +279,74 @@ def check_recipe_against_pantry(recipe_id: str, household_id: str) -> dict:
           "total": int,
         }
     """
-    sb = get_client()
-    ingredients = (
-        sb.table("recipe_ingredients")
-        .select("ingredient_type_id, quantity, unit, note, ingredient_types(name, category)")
-        .eq("recipe_id", recipe_id)
-        .execute()
-    ).data or []
+    ingredients = _recipe_ingredients(
+        recipe_id, household_id, "ingredient_type_id, name, quantity, unit, note, ingredient_types(name, category)"
+    )
 
-    if not ingredients:
-        return {"have": [], "missing": [], "match_pct": 0.0, "total": 0}
+    _, matches = match_against_pantry([ingredient_name(ing) for ing in ingredients], household_id)
+    return coverage(ingredients, matches)
 
-    pantry = get_pantry_items(household_id)
-    pantry_names = [item["specific_name"] for item in pantry]
-    subs = get_substitutions()
 
-    have, missing = [], []
-    for ing in ingredients:
-        # recipe_ingredients still stores ingredient_type_id; get the canonical name
-        ing_name = ing.get("ingredient_types", {}).get("name", "") if ing.get("ingredient_types") else ""
-        if ing_name and find_match(ing_name, pantry_names, subs) is not None:
-            have.append(ing)
-        else:
-            missing.append(ing)
+def cook_action_key(recipe_id: str) -> str:
+    """
+    Idempotency key for the "cook" action of one recipe, minted where its
+    button is rendered and kept in the session, so every rerun (a
+    double-click, a retry after a timeout) sends the same key and replays
+    the first deduction.
+    """
+    return st.session_state.setdefault(_COOK_KEYS, {}).setdefault(recipe_id, str(uuid.uuid4()))
 
-    total = len(ingredients)
-    match_pct = (len(have) / total * 100) if total > 0 else 0.0
-    return {"have": have, "missing": missing, "match_pct": match_pct, "total": total}
+
+def retire_cook_action_key(recipe_id: str) -> None:
+    """
+    Forgets a recipe's cook key so the next cook deducts again. Call when the
+    user starts a new cook (e.g. dismisses the last result), not right after
+    deducting, or a second submit of the same click would get a fresh key.
+    """
+    st.session_state.get(_COOK_KEYS, {}).pop(recipe_id, None)
 
 
-def deduct_from_pantry(recipe_id: str, household_id: str, servings: int = 1, recipe_servings: int = 4) -> list:
+def deduct_from_pantry(
+    recipe_id: str,
+    household_id: str,
+    servings: int = 1,
+    recipe_servings: int = 4,
+    *,
+    idempotency_key: str,
+) -> list:
     """
     Subtracts recipe ingredient quantities from the household pantry
     proportional to the number of servings being cooked.
 
+    Matching happens here; the deductions are then applied in one call to the
+    deduct_pantry_items RPC, which runs every update/delete in a single
+    transaction. idempotency_key identifies one "cook" action within the
+    household (see cook_action_key()); a repeat with the same key returns
+    the first log instead of deducting twice.
+
+    Quantities are compared in base units and unconvertible ones are skipped;
+    see utils.matching.plan_deductions().
+
     Returns a list of human-readable strings describing what was deducted.
     """
     sb = get_client()
     scale = servings / max(recipe_servings, 1)
 
-    ingredients = (
-        sb.table("recipe_ingredients")
-        .select("quantity, unit, ingredient_types(name)")
-        .eq("recipe_id", recipe_id)
-        .execute()
-    ).data or []
+    ingredients = _recipe_ingredients(recipe_id, household_id, "name, quantity, unit, ingredient_types(name)")
 
-    pantry = get_pantry_items(household_id)
-    subs = get_substitutions()
-    log = []
-
-    for ing in ingredients:
-        ing_name = ing.get("ingredient_types", {}).get("name", "") if ing.get("ingredient_types") else ""
-        if not ing_name:
-            continue
-
-        needed_qty = (ing["quantity"] or 1) * scale
-        unit = ing["unit"] or "count"
-
-        matched_name = find_match(ing_name, [item["specific_name"] for item in pantry], subs)
-        if matched_name is None:
-            continue
-
-        item = next(i for i in pantry if i["specific_name"] == matched_name)
-        new_qty = (item["quantity"] or 0) - needed_qty
-
-        if new_qty <= 0:
-            sb.table("pantry_items").delete().eq("id", item["id"]).execute()
-            log.append(f"Used all {item['specific_name']}")
-        else:
-            sb.table("pantry_items").update({"quantity": round(new_qty, 2)}).eq("id", item["id"]).execute()
-            log.append(f"{round(needed_qty, 2)} {unit} {item['specific_name']}")
-            # Update local copy so subsequent ingredients see the reduced quantity
-            item["quantity"] = new_qty
-
-    return log
+    pantry, matches = match_against_pantry([ingredient_name(ing) for ing in ingredients], household_id)
+    deductions, skipped = plan_deductions(ingredients, pantry, matches, scale)
+
+    if not deductions:
+        return skipped
+
+    result = sb.rpc("deduct_pantry_items", {
+        "p_household_id": household_id,
+        "p_deductions": deductions,
+        "p_idempotency_key": idempotency_key,
+    }).execute()
+    bump_pantry_version(household_id)
+    from utils.shopping_list import refresh_for_pantry  # shopping_list imports this module
+
+    refresh_for_pantry(household_id, item_ids=[d["pantry_item_id"] for d in deductions])
+    return (result.data or []) + skipped
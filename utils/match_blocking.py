@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+"""
+Candidate pruning (blocking) for fuzzy name matching.
+
+NameBlocks indexes normalized names by length and by character bigrams of
+their token-sorted form (the string token_sort_ratio actually compares).
+candidates() returns only the names that could still reach FUZZY_THRESHOLD
+against a needle, so the scorer sees a short list instead of every name.
+
+The pruning is exact, not heuristic. With la, lb the token-sorted lengths:
+
+  * token_sort_ratio = 100 * (1 - d / (la + lb)) with d the Indel distance,
+    so a score >= FUZZY_THRESHOLD allows d <= (1 - threshold/100) * (la + lb);
+  * d >= |la - lb|, which bounds the lengths worth looking at;
+  * each insertion or deletion destroys at most two bigrams, so the two names
+    share at least max(la, lb) - 1 - 2d bigrams (counted with multiplicity).
+
+Lengths where that bound is <= 0 (very short names) are taken whole from
+their length bucket. Every name the brute-force scan would accept is
+therefore a candidate: recall is 1.0 by construction, and measure_recall()
+checks it against the brute-force scan (python -m benchmarks.bench_matcher
+fails if it ever comes out lower). Blocking on shared
+whole tokens was considered and rejected: it is not recall-safe under
+token_sort_ratio ("tomato" vs "tomatoe" share no token).
+
+Names can be added and removed one at a time, so a household's index follows
+its pantry without being rebuilt; utils.ingredient_matcher keeps one per
+household for match_against_pantry().
+"""
+
+import math
+from collections import Counter
+
+from rapidfuzz.fuzz import token_sort_ratio
+
+Q = 2
+
+
+def sorted_tokens(name_low: str) -> str:
+    """The form token_sort_ratio compares: whitespace tokens, sorted, joined by single spaces."""
+    return " ".join(sorted(name_low.split()))
+
+
+def _grams(text: str) -> list[str]:
+    """Bigrams tagged with their occurrence number ("an", "an#2"), so set overlap counts multiplicity."""
+    seen: Counter = Counter()
+    grams = []
+    for i in range(len(text) - Q + 1):
+        gram = text[i:i + Q]
+        seen[gram] += 1
+        grams.append(gram if seen[gram] == 1 else f"{gram}#{seen[gram]}")
+    return grams
+
+
+class NameBlocks:
+    """Length buckets plus a bigram inverted index over normalized names."""
+
+    def __init__(self, names: list[str] = (), threshold: float = 82):
+        self.threshold = threshold
+        self._slack = 1 - threshold / 100
+        self._grams: dict[str, list[str]] = {}
+        self._lengths: dict[str, int] = {}
+        self._by_length: dict[int, set[str]] = {}
+        self._postings: dict[str, set[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, name_low: str) -> bool:
+        return name_low in self._lengths
+
+    def add(self, name_low: str) -> None:
+        if name_low in self._lengths:
+            return
+        text = sorted_tokens(name_low)
+        grams = _grams(text)
+        self._grams[name_low] = grams
+        self._lengths[name_low] = len(text)
+        self._by_length.setdefault(len(text), set()).add(name_low)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name_low)
+
+    def remove(self, name_low: str) -> None:
+        length = self._lengths.pop(name_low, None)
+        if length is None:
+            return
+        self._by_length[length].discard(name_low)
+        for gram in self._grams.pop(name_low):
+            posting = self._postings[gram]
+            posting.discard(name_low)
+            if not posting:
+                del self._postings[gram]
+
+    def sync(self, names_low) -> None:
+        """Adds and removes names so the index holds exactly names_low."""
+        wanted = set(names_low)
+        for name in [n for n in self._lengths if n not in wanted]:
+            self.remove(name)
+        for name in wanted:
+            self.add(name)
+
+    def _min_shared(self, la: int, lb: int) -> int:
+        max_distance = math.floor(self._slack * (la + lb) + 1e-9)
+        return max(la, lb) - Q + 1 - Q * max_distance
+
+    def candidates(self, needle_low: str) -> set[str]:
+        """Indexed names that might score >= threshold against needle_low."""
+        text = sorted_tokens(needle_low)
+        la = len(text)
+        # |la - lb| <= slack * (la + lb)  <=>  lb in [la * (1-s)/(1+s), la * (1+s)/(1-s)]
+        lo = math.ceil(la * (1 - self._slack) / (1 + self._slack) - 1e-9)
+        hi = math.floor(la * (1 + self._slack) / (1 - self._slack) + 1e-9)
+
+        found: set[str] = set()
+        need = None  # fewest shared bigrams any gated length requires
+        for lb in range(lo, hi + 1):
+            if not self._by_length.get(lb):
+                continue
+            shared = self._min_shared(la, lb)
+            if shared <= 0:
+                found |= self._by_length[lb]
+            else:
+                need = shared if need is None else min(need, shared)
+        if need is None:
+            return found
+
+        # Prefix filter: a name sharing >= need of the needle's m bigrams shares
+        # at least one of any m - need + 1 of them, so probe only the rarest.
+        grams = sorted(_grams(text), key=lambda g: len(self._postings.get(g, ())))
+        for gram in grams[:len(grams) - need + 1]:
+            for name in self._postings.get(gram, ()):
+                if lo <= self._lengths[name] <= hi:
+                    found.add(name)
+        return found
+
+
+def measure_recall(needles_low: list[str], names_low: list[str], threshold: float = 82) -> dict:
+    """
+    Compares candidates() with a brute-force scan over every (needle, name) pair.
+    Returns {pairs, found, recall, candidates_per_needle, names}; recall must be 1.0.
+    """
+    blocks = NameBlocks(names_low, threshold)
+    pairs = found = total_candidates = 0
+    for needle in needles_low:
+        candidates = blocks.candidates(needle)
+        total_candidates += len(candidates)
+        for name in set(names_low):
+            if token_sort_ratio(needle, name) >= threshold:
+                pairs += 1
+                found += name in candidates
+    return {
+        "pairs": pairs,
+        "found": found,
+        "recall": found / pairs if pairs else 1.0,
+        "candidates_per_needle": total_candidates / max(len(needles_low), 1),
+        "names": len(blocks),
+    }
@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+"""
+Streamlit- and Supabase-free core of ingredient matching and pantry diffs.
+
+Everything here works on plain data (names, row dicts, a SubstitutionIndex
+and an AliasIndex) and imports only rapidfuzz, numpy and other pure utils
+modules, so worker processes, cron jobs, benchmarks and match_batch.py can
+use it without the UI stack. utils.ingredient_matcher is the app-facing
+adapter: it loads pantries, substitutions and the alias taxonomy from
+Supabase, caches them per household, and calls into this module.
+
+Matching order for any two ingredient names:
+  1. Exact match (case-insensitive)
+  2. Both names resolve to the same ingredient type via ingredient_aliases
+     (utils.ingredient_aliases), e.g. "Goat Milk" and "Milk"
+  3. Both names fall in the same substitution equivalence class
+  4. Fuzzy match via token_sort_ratio >= FUZZY_THRESHOLD
+
+Both strings are lowercased before comparison — rapidfuzz scores differ
+meaningfully by case (e.g. "Goat Milk" vs "goat milk" = 77 without lowering).
+
+Here a missing substitutions or aliases argument means "none"; the adapter
+fills in the household's.
+"""
+
+import numpy as np
+from rapidfuzz.fuzz import token_sort_ratio
+from rapidfuzz.process import cdist
+from utils.ingredient_aliases import AliasIndex
+from utils.match_blocking import NameBlocks
+from utils.units import from_base, to_base
+
+FUZZY_THRESHOLD = 82
+
+_NO_ALIASES = AliasIndex([], [])
+
+
+def normalize_name(name: str) -> str:
+    """The form every name is compared in: stripped and lowercased."""
+    return name.strip().lower()
+
+
+class SubstitutionIndex:
+    """
+    Substitution pairs collapsed into equivalence classes with union-find.
+
+    Every normalized name that appears in a pair maps to a class id, so
+    "EVOO" ↔ "Olive Oil" plus "Olive Oil" ↔ "Extra Virgin Olive Oil" also
+    makes "EVOO" match "Extra Virgin Olive Oil". Checking two names is then
+    two dict lookups instead of a scan over every pair.
+    """
+
+    def __init__(self, substitutions: list):
+        parent: dict[str, str] = {}
+
+        def find(name: str) -> str:
+            root = name
+            while parent[root] != root:
+                root = parent[root]
+            while parent[name] != root:  # path compression
+                parent[name], name = root, parent[name]
+            return root
+
+        for pair in substitutions:
+            a = normalize_name(pair["ingredient_a"])
+            b = normalize_name(pair["ingredient_b"])
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        class_ids: dict[str, int] = {}
+        self._class_of: dict[str, int] = {}
+        self._members: dict[int, list[str]] = {}
+        for name in parent:
+            class_id = class_ids.setdefault(find(name), len(class_ids))
+            self._class_of[name] = class_id
+            self._members.setdefault(class_id, []).append(name)
+
+    def __len__(self) -> int:
+        return len(self._class_of)
+
+    def class_of(self, name_low: str) -> int | None:
+        """Class id for an already-normalized name, or None if it has no substitutes."""
+        return self._class_of.get(name_low)
+
+    def equivalents(self, name_low: str) -> list[str]:
+        """Every normalized name in name_low's class, including itself; empty if it has none."""
+        class_id = self._class_of.get(name_low)
+        return self._members[class_id] if class_id is not None else []
+
+    def equivalent(self, a_low: str, b_low: str) -> bool:
+        """True if two already-normalized names are in the same substitution class."""
+        class_a = self._class_of.get(a_low)
+        return class_a is not None and class_a == self._class_of.get(b_low)
+
+
+_NO_SUBSTITUTIONS = SubstitutionIndex([])
+
+
+def _as_index(substitutions: SubstitutionIndex | list | None) -> SubstitutionIndex:
+    if substitutions is None:
+        return _NO_SUBSTITUTIONS
+    if isinstance(substitutions, SubstitutionIndex):
+        return substitutions
+    return SubstitutionIndex(substitutions)
+
+
+def names_match(
+    a: str,
+    b: str,
+    substitutions: SubstitutionIndex | list | None = None,
+    aliases: AliasIndex | None = None,
+) -> bool:
+    """
+    Returns True if a and b refer to the same ingredient via:
+      1. Exact match (case-insensitive)
+      2. Same ingredient type via the alias taxonomy
+      3. Same substitution equivalence class (pairs are transitive)
+      4. Fuzzy token_sort_ratio >= FUZZY_THRESHOLD
+
+    Pass a SubstitutionIndex when calling in a loop; a raw pair list is
+    accepted but gets indexed on every call.
+    """
+    a_low = normalize_name(a)
+    b_low = normalize_name(b)
+
+    if a_low == b_low:
+        return True
+
+    aliases = _NO_ALIASES if aliases is None else aliases
+    type_a = aliases.canonical(a_low)
+    if type_a is not None and type_a == aliases.canonical(b_low):
+        return True
+
+    if _as_index(substitutions).equivalent(a_low, b_low):
+        return True
+
+    return token_sort_ratio(a_low, b_low) >= FUZZY_THRESHOLD
+
+
+def find_match(
+    needle: str,
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    aliases: AliasIndex | None = None,
+    blocks: NameBlocks | None = None,
+) -> str | None:
+    """
+    Returns the first name in name_list that matches needle, or None.
+    name_list should be strings (e.g. specific_name values from pantry).
+
+    With blocks (a NameBlocks over the normalized names in name_list), only
+    names in the needle's candidate blocks are fuzzy-scored; the result is the
+    same because blocking never drops a name that could reach the threshold.
+    """
+    substitutions = _as_index(substitutions)
+    aliases = _NO_ALIASES if aliases is None else aliases
+    if blocks is None:
+        for name in name_list:
+            if names_match(needle, name, substitutions, aliases):
+                return name
+        return None
+
+    low = normalize_name(needle)
+    fuzzy = blocks.candidates(low)
+    type_id = aliases.canonical(low)
+    for name in name_list:
+        name_low = normalize_name(name)
+        if (
+            name_low == low
+            or (type_id is not None and aliases.canonical(name_low) == type_id)
+            or substitutions.equivalent(low, name_low)
+            or (name_low in fuzzy and token_sort_ratio(low, name_low) >= FUZZY_THRESHOLD)
+        ):
+            return name
+    return None
+
+
+def match_indices(
+    needles: list[str],
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    workers: int = 1,
+    aliases: AliasIndex | None = None,
+    blocks: NameBlocks | None = None,
+) -> list[int | None]:
+    """
+    Index into name_list of each needle's match, or None. See match_many().
+
+    With blocks (a NameBlocks over the normalized names in name_list), each
+    fuzzy needle is scored only against its candidates instead of through one
+    cdist over every name. The result is the same: the best score wins, ties
+    go to the earliest name, and blocking never drops a name that could
+    reach the threshold. Worth it when few needles get that far, e.g. the
+    cache misses of a memoized lookup.
+    """
+    results: list[int | None] = [None] * len(needles)
+    if not needles or not name_list:
+        return results
+
+    index = _as_index(substitutions)
+    aliases = _NO_ALIASES if aliases is None else aliases
+    names_low = [normalize_name(n) for n in name_list]
+
+    exact_at: dict[str, int] = {}
+    type_at: dict[str, int] = {}
+    class_at: dict[int, int] = {}
+    for col, low in enumerate(names_low):
+        exact_at.setdefault(low, col)
+        type_id = aliases.canonical(low)
+        if type_id is not None:
+            type_at.setdefault(type_id, col)
+        class_id = index.class_of(low)
+        if class_id is not None:
+            class_at.setdefault(class_id, col)
+
+    # Exact, alias and substitution hits are dict lookups; only the rest go to the scorer.
+    pending: dict[str, list[int]] = {}
+    for row, needle in enumerate(needles):
+        low = normalize_name(needle)
+        col = exact_at.get(low)
+        if col is None:
+            type_id = aliases.canonical(low)
+            col = type_at.get(type_id) if type_id is not None else None
+        if col is None:
+            class_id = index.class_of(low)
+            col = class_at.get(class_id) if class_id is not None else None
+        if col is not None:
+            results[row] = col
+        else:
+            pending.setdefault(low, []).append(row)
+
+    if pending and blocks is not None:
+        first_col: dict[str, int] = {}
+        for col, low in enumerate(names_low):
+            first_col.setdefault(low, col)
+        for low, rows in pending.items():
+            cols = [first_col[name] for name in blocks.candidates(low) if name in first_col]
+            # Highest score, then lowest column, like the argmax below
+            best = max(((token_sort_ratio(low, names_low[col]), -col) for col in cols), default=None)
+            if best is not None and best[0] >= FUZZY_THRESHOLD:
+                for row in rows:
+                    results[row] = -best[1]
+    elif pending:
+        queries = list(pending)
+        # float64 so scores sitting right on the threshold compare exactly as in names_match
+        scores = cdist(
+            queries,
+            names_low,
+            scorer=token_sort_ratio,
+            processor=None,
+            score_cutoff=FUZZY_THRESHOLD,
+            dtype=np.float64,
+            workers=workers,
+        )
+        best = scores.argmax(axis=1)
+        for q, low in enumerate(queries):
+            col = int(best[q])
+            if scores[q, col] >= FUZZY_THRESHOLD:
+                for row in pending[low]:
+                    results[row] = col
+
+    return results
+
+
+def match_many(
+    needles: list[str],
+    name_list: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    workers: int = 1,
+    aliases: AliasIndex | None = None,
+) -> list[str | None]:
+    """
+    Batched find_match: returns the matching name in name_list for each needle, or None.
+
+    Exact, alias and substitution hits are resolved by hash lookup; the remaining
+    needles are scored against every name in a single rapidfuzz cdist call
+    (workers=-1 uses all cores) and take the best score >= FUZZY_THRESHOLD.
+    A needle matches something here exactly when find_match would find a
+    match, though the chosen name can differ when several qualify.
+    """
+    return [
+        name_list[col] if col is not None else None
+        for col in match_indices(needles, name_list, substitutions, workers, aliases)
+    ]
+
+
+def ingredient_name(ing: dict) -> str:
+    """
+    Name of a recipe_ingredients row: the canonical ingredient_types name when
+    the row is linked to the taxonomy, else the raw name stored by imports.
+    """
+    if ing.get("ingredient_types"):
+        return ing["ingredient_types"].get("name", "")
+    return ing.get("name") or ""
+
+
+def with_base_quantity(row: dict, default_quantity: float = 0) -> dict:
+    """Adds base_quantity/base_unit (see utils.units) to a row with quantity and unit."""
+    row["base_quantity"], row["base_unit"] = to_base(float(row.get("quantity") or default_quantity), row.get("unit"))
+    return row
+
+
+def coverage(ingredients: list[dict], matches: list[int | None]) -> dict:
+    """
+    Splits a recipe's ingredient rows by whether each matched the pantry
+    (matches[i] is the match for ingredients[i], e.g. from match_indices()).
+
+    Returns:
+        {
+          "have": [ingredient rows],
+          "missing": [ingredient rows],
+          "match_pct": float (0–100),
+          "total": int,
+        }
+    """
+    have, missing = [], []
+    for ing, match in zip(ingredients, matches):
+        if ingredient_name(ing) and match is not None:
+            have.append(ing)
+        else:
+            missing.append(ing)
+
+    total = len(ingredients)
+    match_pct = (len(have) / total * 100) if total > 0 else 0.0
+    return {"have": have, "missing": missing, "match_pct": match_pct, "total": total}
+
+
+def plan_deductions(
+    ingredients: list[dict], pantry: list[dict], matches: list[int | None], scale: float = 1.0
+) -> tuple[list[dict], list[str]]:
+    """
+    Works out how much of each matched pantry row (with base_quantity/base_unit,
+    see with_base_quantity()) a recipe uses, scaled by servings.
+
+    Recipe and pantry quantities are compared in base units (utils.units), so
+    2 tbsp comes off a pantry item kept in cups correctly; an ingredient whose
+    unit can't be converted to the pantry item's (volume vs count) is left
+    alone and reported as skipped.
+
+    Returns ([{pantry_item_id, amount, label}], [skipped messages]).
+    """
+    deductions, skipped = [], []
+    for ing, match in zip(ingredients, matches):
+        if not ingredient_name(ing) or match is None:
+            continue
+
+        needed_qty = (ing["quantity"] or 1) * scale
+        unit = ing["unit"] or "count"
+        needed_base, needed_base_unit = to_base(needed_qty, unit)
+
+        item = pantry[match]
+        if needed_base_unit != item["base_unit"]:
+            # e.g. cups of butter against a pantry that counts sticks: no honest number to subtract
+            skipped.append(f"Skipped {item['specific_name']}: recipe uses {unit}, pantry tracks {item['unit']}")
+            continue
+
+        deductions.append({
+            "pantry_item_id": item["id"],
+            "amount": from_base(needed_base, item["unit"]),
+            "label": f"{round(needed_qty, 2)} {unit} {item['specific_name']}",
+        })
+    return deductions, skipped
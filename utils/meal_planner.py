@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+"""
+Pantry-aware weekly meal planning.
+
+plan_meals() picks n recipes from the catalog that together use as many
+distinct pantry ingredients as possible while needing as few distinct
+ingredients to buy, scoring
+
+    use_weight * |pantry ingredients used| - buy_weight * |ingredients to buy|
+
+over the union of the chosen recipes, so an ingredient shared by two picks
+is bought (or used) once. Like check_recipe_against_pantry(), an ingredient
+counts as on hand when its name matches a pantry item; quantities are not
+considered.
+
+The catalog is a sparse recipe x ingredient matrix (RecipeCatalog.matrix())
+and every candidate's marginal score is one vectorized pass over it. A greedy
+pass fills the n slots; the remaining time_budget goes to swap moves (replace
+one pick with the best recipe given the others) until none improves the plan.
+"""
+
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from utils.ingredient_matcher import SubstitutionIndex, get_pantry_items, get_substitution_index, match_many
+from utils.recipe_catalog import RecipeCatalog, load_recipe_catalog
+from utils.supabase_client import get_client
+
+
+def _row_sums(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Per-recipe sum of weights over the recipe's ingredients (a CSR matrix-vector product)."""
+    cumulative = np.concatenate(([0], np.cumsum(weights[indices], dtype=np.int64)))
+    return cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+
+
+def plan_meals(
+    catalog: RecipeCatalog,
+    pantry_names: list[str],
+    n: int = 7,
+    substitutions: SubstitutionIndex | list | None = None,
+    user_id: str | None = None,
+    exclude: set[str] | None = None,
+    time_budget: float = 0.5,
+    use_weight: float = 1.0,
+    buy_weight: float = 1.0,
+    workers: int = 1,
+) -> dict:
+    """
+    Chooses up to n recipes for a plan. Returns:
+        {
+          "recipes": [{"recipe_id", "have": int, "total": int, "missing": [names]}],
+          "pantry_used": int,      distinct on-hand ingredients the plan uses
+          "to_buy": [names],       distinct ingredients the plan still needs
+          "score": float,
+          "swaps": int,            improvements found after the greedy pass
+          "elapsed_ms": float,
+        }
+    Private recipes are only considered for their creator (user_id);
+    exclude drops recipe ids, e.g. last week's plan.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+
+    have = np.array(
+        [m is not None for m in match_many(catalog.names, pantry_names, substitutions, workers)], dtype=bool
+    )
+    recipe_ids, indptr, indices = catalog.matrix()
+    exclude = exclude or set()
+    eligible = np.array(
+        [catalog.visible_to(r, user_id) and r not in exclude for r in recipe_ids], dtype=bool
+    )
+    sizes = np.diff(indptr)
+    # Tie-break toward recipes that are mostly on hand
+    coverage = _row_sums(indptr, indices, have.astype(np.int64)) / np.maximum(sizes, 1) * 1e-3
+
+    def marginal(covered: np.ndarray) -> np.ndarray:
+        uses = _row_sums(indptr, indices, (have & ~covered).astype(np.int64))
+        buys = _row_sums(indptr, indices, (~have & ~covered).astype(np.int64))
+        gains = use_weight * uses - buy_weight * buys + coverage
+        gains[~eligible] = -np.inf
+        return gains
+
+    def objective(covered: np.ndarray) -> float:
+        return use_weight * np.count_nonzero(covered & have) - buy_weight * np.count_nonzero(covered & ~have)
+
+    # counts[j] = how many picks use ingredient j, so a pick can be taken back out
+    counts = np.zeros(len(catalog.names), dtype=np.int64)
+    chosen: list[int] = []
+    for _ in range(min(n, int(eligible.sum()))):
+        gains = marginal(counts > 0)
+        gains[chosen] = -np.inf
+        best = int(gains.argmax())
+        chosen.append(best)
+        counts[indices[indptr[best]:indptr[best + 1]]] += 1
+
+    swaps = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for slot, current in enumerate(chosen):
+            if time.perf_counter() >= deadline:
+                break
+            own = indices[indptr[current]:indptr[current + 1]]
+            counts[own] -= 1
+            others = counts > 0
+            gains = marginal(others)
+            kept = gains[current]
+            gains[chosen] = -np.inf
+            best = int(gains.argmax())
+            if gains[best] > kept + 1e-9:
+                chosen[slot] = best
+                swaps += 1
+                improved = True
+                counts[indices[indptr[best]:indptr[best + 1]]] += 1
+            else:
+                counts[own] += 1
+
+    covered = counts > 0
+    picks = []
+    for r in chosen:
+        own = indices[indptr[r]:indptr[r + 1]]
+        picks.append({
+            "recipe_id": recipe_ids[r],
+            "have": int(np.count_nonzero(have[own])),
+            "total": int(len(own)),
+            "missing": [catalog.names[j] for j in own if not have[j]],
+        })
+    return {
+        "recipes": picks,
+        "pantry_used": int(np.count_nonzero(covered & have)),
+        "to_buy": [catalog.names[j] for j in np.flatnonzero(covered & ~have)],
+        "score": float(objective(covered)),
+        "swaps": swaps,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def plan_for_household(household_id: str, n: int = 7, user_id: str | None = None, **kwargs) -> dict:
+    """plan_meals() against the household's pantry, substitutions and the cached catalog."""
+    pantry_names = [item["specific_name"] for item in get_pantry_items(household_id)]
+    return plan_meals(
+        load_recipe_catalog(), pantry_names, n, get_substitution_index(household_id), user_id, **kwargs
+    )
+
+
+def save_meal_plan(
+    household_id: str,
+    recipe_ids: list[str],
+    start_date: date,
+    name: str | None = None,
+    meal_type: str = "dinner",
+    servings: int = 4,
+) -> str:
+    """Writes a plan as one meal_plans row plus one meal_plan_recipes row per day. Returns the plan id."""
+    sb = get_client()
+    plan = (
+        sb.table("meal_plans")
+        .insert({
+            "household_id": household_id,
+            "name": name or f"Week of {start_date:%b %d}",
+            "start_date": start_date.isoformat(),
+        })
+        .execute()
+    ).data[0]
+    if recipe_ids:
+        sb.table("meal_plan_recipes").insert([
+            {
+                "meal_plan_id": plan["id"],
+                "recipe_id": recipe_id,
+                "meal_date": (start_date + timedelta(days=i)).isoformat(),
+                "meal_type": meal_type,
+                "servings": servings,
+            }
+            for i, recipe_id in enumerate(recipe_ids)
+        ]).execute()
+    return plan["id"]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+"""
+Concurrent data loading for a page render.
+
+A render declares the independent queries it needs as named loaders and
+load() runs them together on a small thread pool, so the render waits
+about as long as its slowest query instead of the sum of all of them:
+
+    data = page_data.load(
+        substitutions=lambda: get_substitutions(hh_id),
+        items=lambda: get_pantry_items(hh_id),
+    )
+
+Loaders run with the calling thread's Streamlit script context (so
+get_client() still sees the signed-in session) and its contextvars (so
+query_log.capture() still records their queries). Each call gets its own
+threads, at most PAGE_DATA_WORKERS, so one session's context can never leak
+into a thread that later serves another session; starting a thread costs far
+less than the queries it runs.
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+MAX_WORKERS = int(os.getenv("PAGE_DATA_WORKERS", "8"))
+
+
+def load(**loaders: Callable[[], Any]) -> dict[str, Any]:
+    """
+    Runs every loader concurrently and returns {name: result}. Waits for all
+    of them; if any raised, the first failure in declaration order is
+    re-raised. A single loader runs inline.
+    """
+    if len(loaders) <= 1 or MAX_WORKERS <= 1:
+        return {name: loader() for name, loader in loaders.items()}
+
+    script_ctx = get_script_run_ctx(suppress_warning=True)
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_WORKERS, len(loaders)),
+        thread_name_prefix="page-data",
+        initializer=add_script_run_ctx if script_ctx is not None else None,
+        initargs=(None, script_ctx),
+    ) as pool:
+        futures = {
+            name: pool.submit(contextvars.copy_context().run, loader)
+            for name, loader in loaders.items()
+        }
+    results, errors = {}, []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    return results
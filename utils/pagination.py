@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+"""
+Keyset-paginated PostgREST reads.
+
+iter_pages() runs a query one page at a time, ordered by a unique key and
+resuming after the last key seen (WHERE key > last ORDER BY key LIMIT n),
+and yields each page as it arrives. Unlike OFFSET/range paging, every page
+costs the database the same index seek however deep it is, and rows
+inserted or deleted mid-read can't shift later pages into duplicates or
+gaps. Nothing is fetched until the caller asks for the next page, so a
+consumer that folds rows into an index as they stream holds one page of raw
+JSON at a time instead of the whole table.
+
+Keep page_size at or below the project's PostgREST max-rows (1000 by
+default): the server silently truncates larger pages, which would read as
+the last page.
+"""
+
+import os
+from typing import Any, Callable, Iterator
+
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+
+def iter_pages(query: Callable[[], Any], key: str = "id", page_size: int = PAGE_SIZE) -> Iterator[list[dict]]:
+    """
+    Yields the rows of query() a page at a time, in key order.
+
+    query returns a fresh filtered builder (table().select(...).eq(...)) on
+    each call; the select must include key, which must be unique.
+    """
+    last = None
+    while True:
+        builder = query()
+        if last is not None:
+            builder = builder.gt(key, last)
+        page = builder.order(key).limit(page_size).execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1][key]
+
+
+def iter_rows(query: Callable[[], Any], key: str = "id", page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """iter_pages() flattened to one row at a time."""
+    for page in iter_pages(query, key, page_size):
+        yield from page
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+"""
+Local SQLite snapshot of each household's pantry and substitution pairs.
+
+Reads come from the snapshot. Before a read, the snapshot is brought up to
+date with one sync_changes RPC that returns only rows whose updated_at is
+newer than the last sync, plus tombstones for rows deleted since then, so
+the cost of a page load doesn't grow with the pantry. A household is synced
+at most every PANTRY_SNAPSHOT_MAX_AGE seconds (PANTRY_SNAPSHOT_PUSHED_MAX_AGE
+while utils.cache_events receives its changes) unless a write or a pushed
+change marked it stale (mark_stale()).
+
+If the sync fails (e.g. a short Supabase outage) and the household has been
+synced before, reads fall back to the last snapshot and is_offline() is True
+until a later sync succeeds. The first sync of a household has no fallback
+and raises.
+
+Each delta re-fetches an OVERLAP window before the last cursor, because a
+row's updated_at is its transaction's start time and a slow transaction can
+commit after a sync that already moved past it.
+
+A full resync (first sync, or a cursor older than the server's tombstones)
+takes its cursor and substitutions from sync_changes, then streams
+pantry_items a page at a time (utils.pagination) into the snapshot, so a
+large pantry never arrives as one response. Rows written while it pages
+are newer than that cursor and come in with the next delta.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.pagination import iter_pages
+from utils.supabase_client import get_client
+
+SNAPSHOT_PATH = os.getenv("PANTRY_SNAPSHOT_PATH", os.path.join(".cache", "pantry_snapshot.sqlite3"))
+MAX_AGE = float(os.getenv("PANTRY_SNAPSHOT_MAX_AGE", "5"))
+# Used instead while utils.cache_events has a live push subscription for the household
+PUSHED_MAX_AGE = float(os.getenv("PANTRY_SNAPSHOT_PUSHED_MAX_AGE", "300"))
+
+OVERLAP = timedelta(seconds=60)
+# Server keeps tombstones for 30 days; older cursors do a full resync.
+FULL_RESYNC_AFTER = timedelta(days=29)
+
+logger = logging.getLogger("smartpantry.snapshot")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pantry_items (
+    id            TEXT PRIMARY KEY,
+    household_id  TEXT NOT NULL,
+    specific_name TEXT NOT NULL,
+    quantity      REAL,
+    unit          TEXT,
+    updated_at    TEXT
+);
+CREATE INDEX IF NOT EXISTS pantry_items_household ON pantry_items (household_id);
+CREATE INDEX IF NOT EXISTS pantry_items_household_name
+    ON pantry_items (household_id, specific_name COLLATE NOCASE, id);
+
+CREATE TABLE IF NOT EXISTS ingredient_substitutions (
+    id           TEXT PRIMARY KEY,
+    household_id TEXT,
+    ingredient_a TEXT NOT NULL,
+    ingredient_b TEXT NOT NULL,
+    updated_at   TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    household_id TEXT PRIMARY KEY,
+    synced_at    TEXT NOT NULL
+);
+
+-- Pantry ids a full resync has received so far; the rest are pruned at the end
+CREATE TEMP TABLE IF NOT EXISTS resync_seen (
+    household_id TEXT NOT NULL,
+    id           TEXT NOT NULL,
+    PRIMARY KEY (household_id, id)
+);
+"""
+
+# _lock guards the connection and the dicts below; a household's sync also
+# holds its own lock so one slow request doesn't block other households.
+_lock = threading.RLock()
+_household_locks: dict[str, threading.Lock] = {}
+_conn: sqlite3.Connection | None = None
+
+# household_id -> time.monotonic() of the last sync attempt in this process
+_checked: dict[str, float] = {}
+_offline: set[str] = set()
+_pushed: set[str] = set()
+# household_id -> count of syncs that changed its pantry rows
+_generations: dict[str, int] = {}
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        if SNAPSHOT_PATH != ":memory:":
+            os.makedirs(os.path.dirname(SNAPSHOT_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(SNAPSHOT_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def _cursor_for(conn: sqlite3.Connection, household_id: str) -> datetime | None:
+    row = conn.execute("SELECT synced_at FROM sync_state WHERE household_id = ?", (household_id,)).fetchone()
+    return datetime.fromisoformat(row["synced_at"]) if row else None
+
+
+def _upsert_pantry(conn: sqlite3.Connection, household_id: str, rows: list[dict]) -> int:
+    """Upserts pantry rows; returns how many actually changed."""
+    # Rows re-sent by the overlap window are unchanged and don't count
+    return conn.executemany(
+        "INSERT INTO pantry_items (id, household_id, specific_name, quantity, unit, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (id) DO UPDATE SET specific_name = excluded.specific_name,"
+        " quantity = excluded.quantity, unit = excluded.unit, updated_at = excluded.updated_at"
+        " WHERE excluded.updated_at IS NOT pantry_items.updated_at",
+        [
+            (r["id"], household_id, r["specific_name"], r.get("quantity"), r.get("unit"), r.get("updated_at"))
+            for r in rows
+        ],
+    ).rowcount
+
+
+def _write_substitutions(conn: sqlite3.Connection, household_id: str, changes: dict) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO ingredient_substitutions"
+        " (id, household_id, ingredient_a, ingredient_b, updated_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (r["id"], r.get("household_id"), r["ingredient_a"], r["ingredient_b"], r.get("updated_at"))
+            for r in changes.get("ingredient_substitutions") or []
+        ],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (household_id, synced_at) VALUES (?, ?)",
+        (household_id, changes["synced_at"]),
+    )
+
+
+def _apply(conn: sqlite3.Connection, household_id: str, changes: dict) -> bool:
+    """Writes one sync_changes delta. Returns True if the household's pantry rows changed."""
+    with conn:
+        removed = 0
+        for tomb in changes.get("deleted") or []:
+            table = tomb["table_name"]
+            if table in ("pantry_items", "ingredient_substitutions"):
+                removed += conn.execute(f"DELETE FROM {table} WHERE id = ?", (tomb["row_id"],)).rowcount
+        upserted = _upsert_pantry(conn, household_id, changes.get("pantry_items") or [])
+        _write_substitutions(conn, household_id, changes)
+    return upserted > 0 or removed > 0
+
+
+def _resync(client, household_id: str) -> bool:
+    """
+    Replaces the household's snapshot. Each page is written in its own short
+    transaction; rows the pages didn't include are deleted and the cursor
+    saved only once the last page is in, so a resync that fails part way
+    leaves a snapshot that the next sync still treats as stale.
+    """
+    changes = client.rpc(
+        "sync_changes", {"p_household_id": household_id, "p_since": None, "p_pantry": False}
+    ).execute().data
+    pages = iter_pages(
+        lambda: client.table("pantry_items")
+        .select("id, specific_name, quantity, unit, updated_at")
+        .eq("household_id", household_id)
+    )
+
+    with _lock:
+        conn = _connection()
+        with conn:
+            conn.execute("DELETE FROM resync_seen WHERE household_id = ?", (household_id,))
+    upserted = 0
+    for page in pages:
+        with _lock:
+            conn = _connection()
+            with conn:
+                upserted += _upsert_pantry(conn, household_id, page)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO resync_seen (household_id, id) VALUES (?, ?)",
+                    [(household_id, r["id"]) for r in page],
+                )
+
+    with _lock:
+        conn = _connection()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM pantry_items WHERE household_id = ?"
+                " AND id NOT IN (SELECT id FROM resync_seen WHERE household_id = ?)",
+                (household_id, household_id),
+            ).rowcount
+            conn.execute("DELETE FROM resync_seen WHERE household_id = ?", (household_id,))
+            conn.execute(
+                "DELETE FROM ingredient_substitutions WHERE household_id = ? OR household_id IS NULL",
+                (household_id,),
+            )
+            _write_substitutions(conn, household_id, changes)
+    return upserted > 0 or removed > 0
+
+
+def sync(household_id: str, force: bool = False) -> bool:
+    """
+    Brings one household's snapshot up to date, unless it was checked less
+    than MAX_AGE seconds ago and nothing marked it stale. Returns False when
+    the snapshot is being served from a failed sync.
+    """
+    with _lock:
+        household_lock = _household_locks.setdefault(household_id, threading.Lock())
+
+    with household_lock:
+        last = _checked.get(household_id)
+        max_age = PUSHED_MAX_AGE if household_id in _pushed else MAX_AGE
+        if not force and last is not None and time.monotonic() - last < max_age:
+            return household_id not in _offline
+
+        with _lock:
+            cursor = _cursor_for(_connection(), household_id)
+        full = cursor is None or datetime.now(timezone.utc) - cursor > FULL_RESYNC_AFTER
+        client = get_client()
+        try:
+            if full:
+                changed = _resync(client, household_id)
+            else:
+                params = {"p_household_id": household_id, "p_since": (cursor - OVERLAP).isoformat()}
+                changes = client.rpc("sync_changes", params).execute().data
+        except Exception as e:
+            if cursor is None:
+                raise
+            logger.warning("pantry snapshot sync failed for %s, serving last snapshot: %s", household_id, e)
+            _checked[household_id] = time.monotonic()
+            _offline.add(household_id)
+            return False
+
+        with _lock:
+            if not full:
+                changed = _apply(_connection(), household_id, changes)
+            if changed:
+                _generations[household_id] = _generations.get(household_id, 0) + 1
+            _checked[household_id] = time.monotonic()
+            _offline.discard(household_id)
+        return True
+
+
+def mark_stale(household_id: str | None = None) -> None:
+    """Forces the next read for a household (or every household) to sync first."""
+    with _lock:
+        if household_id is None:
+            _checked.clear()
+        else:
+            _checked.pop(household_id, None)
+
+
+def set_pushed(household_id: str, pushed: bool) -> None:
+    """Records whether changes to the household are being pushed to this process."""
+    with _lock:
+        if pushed:
+            _pushed.add(household_id)
+        else:
+            _pushed.discard(household_id)
+            _checked.pop(household_id, None)
+
+
+def is_offline(household_id: str) -> bool:
+    """True while the household's reads come from a snapshot whose last sync failed."""
+    return household_id in _offline
+
+
+def generation(household_id: str) -> int:
+    """Bumped whenever a sync brings in pantry changes, including ones made by other processes."""
+    return _generations.get(household_id, 0)
+
+
+def pantry_rows(household_id: str) -> list[dict]:
+    """The household's pantry rows {id, specific_name, quantity, unit}, sorted by name."""
+    sync(household_id)
+    with _lock:
+        rows = _connection().execute(
+            "SELECT id, specific_name, quantity, unit FROM pantry_items"
+            " WHERE household_id = ? ORDER BY specific_name COLLATE NOCASE, id",
+            (household_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def pantry_count(household_id: str) -> int:
+    """Number of pantry rows the household has."""
+    sync(household_id)
+    with _lock:
+        return _connection().execute(
+            "SELECT count(*) FROM pantry_items WHERE household_id = ?", (household_id,)
+        ).fetchone()[0]
+
+
+def pantry_window(household_id: str, after: tuple[str, str] | None, limit: int) -> list[dict]:
+    """
+    One window of pantry_rows(), for views that render a large pantry a slice
+    at a time: the limit rows after the (specific_name, id) of the previous
+    window's last row, or the first window when after is None. Seeks the name
+    index, so a deep window costs the same as the first.
+    """
+    sync(household_id)
+    sql = "SELECT id, specific_name, quantity, unit FROM pantry_items WHERE household_id = ?"
+    params: tuple = (household_id,)
+    if after is not None:
+        sql += (
+            " AND specific_name COLLATE NOCASE >= ?"
+            " AND (specific_name COLLATE NOCASE > ? OR id > ?)"
+        )
+        params += (after[0], after[0], after[1])
+    with _lock:
+        rows = _connection().execute(
+            sql + " ORDER BY specific_name COLLATE NOCASE, id LIMIT ?", params + (limit,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def substitution_rows(household_id: str) -> list[dict]:
+    """Global substitution pairs plus the household's own, as {id, household_id, ingredient_a, ingredient_b}."""
+    sync(household_id)
+    with _lock:
+        rows = _connection().execute(
+            "SELECT id, household_id, ingredient_a, ingredient_b FROM ingredient_substitutions"
+            " WHERE household_id IS NULL OR household_id = ?",
+            (household_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
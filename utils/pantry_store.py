@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+"""
+Bulk pantry writes.
+
+The Pantry page edits the whole inventory in one grid; diff_inventory() turns
+the edited grid back into the rows that actually changed, and
+apply_inventory_changes() writes them with one upsert plus one delete instead
+of a request (and a rerun) per touched item.
+"""
+
+from utils.ingredient_matcher import bump_pantry_version
+from utils.shopping_list import refresh_for_pantry
+from utils.supabase_client import get_client
+from utils.units import canonical_unit
+
+
+def diff_inventory(original: list, edited, household_id: str) -> tuple[list, list]:
+    """
+    Compares the loaded pantry rows with the edited grid.
+
+    edited is what st.data_editor returned for rows shaped like
+    {id, specific_name, quantity, unit, remove}: a list of dicts or a DataFrame.
+
+    Returns (upserts, deleted_ids): full rows for every item whose name,
+    quantity or unit changed, and ids of items ticked for removal.
+    """
+    if hasattr(edited, "to_dict"):
+        edited = edited.to_dict("records")
+
+    before = {row["id"]: row for row in original}
+    upserts, deleted_ids = [], []
+
+    for row in edited:
+        old = before.get(row.get("id"))
+        if old is None:
+            continue
+        if row.get("remove"):
+            deleted_ids.append(old["id"])
+            continue
+
+        name = (row.get("specific_name") or "").strip() or old["specific_name"]
+        unit = (row.get("unit") or "").strip()
+        unit = old["unit"] if unit in ("", old["unit"]) else canonical_unit(unit)
+        qty = row.get("quantity")
+        qty = 0.0 if qty is None or qty != qty else float(qty)  # qty != qty catches NaN from cleared cells
+
+        if (name, qty, unit) != (old["specific_name"], float(old["quantity"] or 0), old["unit"]):
+            upserts.append({
+                "id": old["id"],
+                "household_id": household_id,
+                "specific_name": name,
+                "quantity": qty,
+                "unit": unit,
+            })
+
+    return upserts, deleted_ids
+
+
+def apply_inventory_changes(household_id: str, upserts: list, deleted_ids: list) -> None:
+    """Writes a diff from diff_inventory() in at most two requests."""
+    if not upserts and not deleted_ids:
+        return
+    sb = get_client()
+    if upserts:
+        sb.table("pantry_items").upsert(upserts, on_conflict="id").execute()
+    if deleted_ids:
+        sb.table("pantry_items").delete().in_("id", deleted_ids).eq("household_id", household_id).execute()
+    bump_pantry_version(household_id)
+    refresh_for_pantry(
+        household_id, [row["specific_name"] for row in upserts], [row["id"] for row in upserts] + list(deleted_ids)
+    )
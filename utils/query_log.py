@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+"""
+Per-render PostgREST query instrumentation.
+
+With QUERY_LOG=1, _AuthClient hands out InstrumentedQuery wrappers that
+record table, operation, filters, latency, response bytes and row count for
+every execute(). Records are grouped per Streamlit run and emitted as one
+structured JSON log line on the "smartpantry.queries" logger; with
+QUERY_LOG_PANEL=1 the run's queries are also shown in a sidebar panel.
+When neither is set the client returns plain builders and nothing here runs.
+
+Pages bracket a render with start_run() / finish_run(). A run that ends
+early (st.rerun(), st.stop()) never reaches finish_run(); its queries are
+flushed as their own group by the next start_run().
+
+capture() collects records outside Streamlit, e.g. to assert how many round
+trips deduct_from_pantry makes.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import streamlit as st
+
+ENABLED = os.getenv("QUERY_LOG", "") not in ("", "0", "false")
+PANEL = os.getenv("QUERY_LOG_PANEL", "") not in ("", "0", "false")
+
+logger = logging.getLogger("smartpantry.queries")
+if ENABLED and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+_STATE_KEY = "_query_log"
+_capture: ContextVar[list | None] = ContextVar("query_log_capture", default=None)
+
+
+def is_enabled() -> bool:
+    return ENABLED or PANEL or _capture.get() is not None
+
+
+class InstrumentedQuery:
+    """
+    Proxy over a postgrest request builder. Every chained call returns another
+    InstrumentedQuery so the table/operation/filters travel with the builder;
+    execute() runs the real request and records it.
+    """
+
+    def __init__(self, builder, table: str, operation: str | None = None, filters: tuple = ()):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._filters = filters
+
+    def _wrap(self, result, name: str, args: tuple):
+        if not hasattr(result, "execute"):
+            return result
+        operation, filters = self._operation, self._filters
+        if name in _OPERATIONS:
+            operation = name
+        elif not name.startswith("_"):
+            # Column name only; values can be tokens or user data
+            column = args[0] if args and isinstance(args[0], str) else ""
+            filters = (*filters, f"{name.rstrip('_')}:{column}" if column else name.rstrip("_"))
+        return InstrumentedQuery(result, self._table, operation, filters)
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # e.g. builder.headers, or the .not_ property that returns a builder
+            return self._wrap(attr, name, ())
+
+        def call(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), name, args)
+
+        return call
+
+    def execute(self):
+        start = time.perf_counter()
+        try:
+            result = self._builder.execute()
+        except Exception as e:
+            _record(self._table, self._operation, self._filters, start, error=str(e))
+            raise
+        _record(self._table, self._operation, self._filters, start, data=result.data)
+        return result
+
+
+def _record(table, operation, filters, start, data=None, error=None) -> None:
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if isinstance(data, list):
+        rows = len(data)
+    else:
+        rows = 0 if data is None else 1
+    entry = {
+        "table": table,
+        "operation": operation or "select",
+        "filters": list(filters),
+        "ms": round(elapsed_ms, 1),
+        "bytes": len(json.dumps(data, default=str)) if data is not None else 0,
+        "rows": rows,
+    }
+    if error:
+        entry["error"] = error
+
+    captured = _capture.get()
+    if captured is not None:
+        captured.append(entry)
+        return
+    try:
+        st.session_state.setdefault(_STATE_KEY, []).append(entry)
+    except Exception:
+        # No Streamlit session (worker thread, script outside `streamlit run`)
+        logger.info(json.dumps({"query": entry}))
+
+
+def _take() -> list:
+    try:
+        return st.session_state.pop(_STATE_KEY, [])
+    except Exception:
+        return []
+
+
+def _emit(page: str, records: list) -> None:
+    if records:
+        logger.info(json.dumps({
+            "page": page,
+            "queries": len(records),
+            "total_ms": round(sum(r["ms"] for r in records), 1),
+            "total_bytes": sum(r["bytes"] for r in records),
+            "records": records,
+        }))
+
+
+def start_run(page: str) -> None:
+    """Call at the top of a page. Flushes queries left over from a run that ended early."""
+    if not (ENABLED or PANEL):
+        return
+    _emit(f"{page} (previous run)", _take())
+
+
+def finish_run(page: str) -> list:
+    """Call at the bottom of a page. Logs this run's queries and renders the debug panel."""
+    if not (ENABLED or PANEL):
+        return []
+    records = _take()
+    _emit(page, records)
+    if PANEL:
+        total_ms = sum(r["ms"] for r in records)
+        with st.sidebar.expander(f"🔍 {len(records)} queries · {total_ms:.0f} ms"):
+            if records:
+                st.dataframe(records, hide_index=True, use_container_width=True)
+            else:
+                st.caption("No queries this run.")
+    return records
+
+
+@contextmanager
+def capture():
+    """Collects query records in a list for the duration of the block, Streamlit or not."""
+    records: list = []
+    token = _capture.set(records)
+    try:
+        yield records
+    finally:
+        _capture.reset(token)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+"""
+Whole-catalog "which recipes can I cook" ranking.
+
+check_recipe_against_pantry() costs three queries per recipe. Here every
+recipe_ingredients row is loaded once (paged, cached) into an inverted index
+of normalized ingredient name -> recipes, so scoring the full catalog against
+a pantry is one match_many() over the distinct names plus one pass over the
+index, with no per-recipe round trips.
+"""
+
+import heapq
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+import streamlit as st
+from utils.ingredient_matcher import (
+    SubstitutionIndex,
+    get_pantry_items,
+    get_substitution_index,
+    ingredient_name,
+    match_many,
+    normalize_name,
+)
+from utils.pagination import iter_rows
+from utils.supabase_client import get_anon_client
+
+
+class RecipeCatalog:
+    """
+    Inverted index over recipe_ingredients rows.
+
+    names          distinct normalized ingredient names in the catalog
+    recipes_by_name name -> [(recipe_id, rows of that name in the recipe)]
+    totals         recipe_id -> ingredient row count (the match_pct denominator)
+    visibility     recipe_id -> (is_public, created_by)
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        by_name: dict[str, Counter] = {}
+        self.totals: Counter = Counter()
+        self.visibility: dict[str, tuple[bool, str | None]] = {}
+
+        for row in rows:
+            recipe_id = row["recipe_id"]
+            self.totals[recipe_id] += 1
+            if recipe_id not in self.visibility:
+                # No embedded recipe (hidden from the loading client) means private
+                recipe = row.get("recipes") or {}
+                self.visibility[recipe_id] = (bool(recipe.get("is_public")), recipe.get("created_by"))
+            name = normalize_name(ingredient_name(row))
+            if name:
+                by_name.setdefault(name, Counter())[recipe_id] += 1
+
+        self.recipes_by_name = {name: list(counts.items()) for name, counts in by_name.items()}
+        self.names = list(self.recipes_by_name)
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def visible_to(self, recipe_id: str, user_id: str | None) -> bool:
+        is_public, created_by = self.visibility.get(recipe_id, (False, None))
+        return bool(is_public) or (user_id is not None and created_by == user_id)
+
+    def matrix(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """
+        The catalog as a sparse recipe x ingredient matrix in CSR form:
+        (recipe_ids, indptr, indices), where recipe recipe_ids[r] uses the
+        names self.names[j] for j in indices[indptr[r]:indptr[r + 1]]. Each
+        distinct name appears once per recipe. Built on first use.
+        """
+        if self._matrix is None:
+            by_recipe: dict[str, list[int]] = {}
+            for j, name in enumerate(self.names):
+                for recipe_id, _ in self.recipes_by_name[name]:
+                    by_recipe.setdefault(recipe_id, []).append(j)
+            recipe_ids = list(by_recipe)
+            indptr = np.zeros(len(recipe_ids) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(by_recipe[r]) for r in recipe_ids])
+            indices = np.fromiter(
+                (j for r in recipe_ids for j in by_recipe[r]), dtype=np.int64, count=int(indptr[-1])
+            )
+            self._matrix = (recipe_ids, indptr, indices)
+        return self._matrix
+
+
+@st.cache_resource(ttl=600)
+def load_recipe_catalog() -> RecipeCatalog:
+    """
+    Streams every recipe_ingredients row once, a page at a time, into the
+    index. The catalog is shared by every session, so it is loaded without
+    any user's JWT and visible_to() does the per-user filtering.
+    """
+    sb = get_anon_client()
+    return RecipeCatalog(iter_rows(
+        lambda: sb.table("recipe_ingredients").select(
+            "id, recipe_id, name, ingredient_types(name), recipes(is_public, created_by)"
+        )
+    ))
+
+
+def score_catalog(
+    catalog: RecipeCatalog,
+    pantry_names: list[str],
+    substitutions: SubstitutionIndex | list | None = None,
+    top_k: int | None = 20,
+    user_id: str | None = None,
+    workers: int = 1,
+) -> list[dict]:
+    """
+    Scores every recipe in the catalog against pantry_names in one pass.
+
+    Returns up to top_k (all if None) of:
+        {"recipe_id": str, "match_pct": float (0–100), "have": int, "total": int}
+    sorted by match_pct, then by how many ingredients are on hand.
+    """
+    matches = match_many(catalog.names, pantry_names, substitutions, workers)
+
+    have: Counter = Counter()
+    for name, match in zip(catalog.names, matches):
+        if match is not None:
+            for recipe_id, count in catalog.recipes_by_name[name]:
+                have[recipe_id] += count
+
+    scored = (
+        {
+            "recipe_id": recipe_id,
+            "match_pct": have[recipe_id] / total * 100,
+            "have": have[recipe_id],
+            "total": total,
+        }
+        for recipe_id, total in catalog.totals.items()
+        if catalog.visible_to(recipe_id, user_id)
+    )
+    sort_key = lambda r: (r["match_pct"], r["have"])
+    if top_k is None:
+        return sorted(scored, key=sort_key, reverse=True)
+    return heapq.nlargest(top_k, scored, key=sort_key)
+
+
+def rank_recipes(household_id: str, top_k: int | None = 20, user_id: str | None = None) -> list:
+    """
+    Ranks the whole recipe catalog by coverage of the household pantry.
+    Pass user_id to include that user's private recipes alongside public ones.
+    """
+    pantry_names = [item["specific_name"] for item in get_pantry_items(household_id)]
+    return score_catalog(load_recipe_catalog(), pantry_names, get_substitution_index(household_id), top_k, user_id)
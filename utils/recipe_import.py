@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+"""
+Recipe imports from the pending_imports queue.
+
+The Chrome extension stores a page's schema.org/Recipe JSON-LD in
+pending_imports.raw_data. parse_import() turns one queued row into a
+recipes row plus its recipe_ingredients (via recipe-scrapers' schema.org
+parser, with ingredient lines split into quantity / unit / name / note here),
+and the queue helpers claim and finish rows in batches through the
+claim_pending_imports / finish_pending_imports RPCs. import_worker.py runs
+them in a loop.
+
+Parsing needs no database; the queue helpers take a service-role client.
+"""
+
+import json
+import re
+import unicodedata
+import uuid
+
+from postgrest.exceptions import APIError
+from recipe_scrapers import scrape_html
+from utils.units import parse_unit
+
+
+class ImportFailed(ValueError):
+    """A queued import that can't become a recipe. The message is stored as the row's error."""
+
+
+_FRACTIONS = {c: unicodedata.numeric(c) for c in "¼½¾⅐⅑⅒⅓⅔⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞"}
+_QTY_RE = re.compile(
+    r"^\s*(?P<qty>(?:\d+\s+\d+/\d+)|(?:\d+/\d+)|(?:\d*\.\d+)|(?:\d+))?\s*"
+    r"(?P<frac>[" + "".join(_FRACTIONS) + r"])?"
+    r"(?:\s*(?:-|–|to)\s*[\d./" + "".join(_FRACTIONS) + r"]+)?"  # "1-2 cups": keep the lower bound
+)
+_PAREN_RE = re.compile(r"^\(([^)]*)\)\s*")
+
+# Units utils.units doesn't know (they're their own base unit) but that still
+# read as a unit in an ingredient line rather than as part of the name.
+_WORD_UNITS = {
+    "can", "clove", "pinch", "dash", "slice", "package", "pkg", "stick", "bunch",
+    "sprig", "handful", "head", "jar", "bottle", "bag", "box", "sheet", "drop",
+}
+
+
+def _number(text: str) -> float:
+    whole, _, frac = text.strip().partition(" ")
+    if frac:
+        return float(whole) + _number(frac)
+    if "/" in whole:
+        num, den = whole.split("/")
+        return float(num) / float(den)
+    return float(whole)
+
+
+def _split_unit(rest: str) -> tuple[str | None, str]:
+    words = rest.split()
+    for size in (2, 1):
+        if len(words) < size:
+            continue
+        candidate = " ".join(words[:size]).rstrip(".")
+        unit = parse_unit(candidate)
+        if unit.dimension != "other" or unit.name in _WORD_UNITS:
+            return unit.name, " ".join(words[size:])
+    return None, rest
+
+
+def parse_ingredient_line(line: str) -> dict:
+    """
+    Splits a free-text ingredient line into {name, quantity, unit, note}, e.g.
+    "1 1/2 cups flour, sifted" -> {"flour", 1.5, "cup", "sifted"}. Parts that
+    aren't there are None. A line that is only a quantity and unit ("1 can")
+    is named after the unit; the whole line becomes the name if nothing parses.
+    """
+    text = " ".join(line.split())
+    match = _QTY_RE.match(text)
+    quantity = None
+    if match.group("qty"):
+        quantity = _number(match.group("qty"))
+    if match.group("frac"):
+        quantity = (quantity or 0) + _FRACTIONS[match.group("frac")]
+    rest = text[match.end():] if quantity is not None else text
+
+    notes = []
+    paren = _PAREN_RE.match(rest)
+    if paren:  # "1 (14 oz) can tomatoes"
+        notes.append(paren.group(1))
+        rest = rest[paren.end():]
+
+    unit = None
+    if quantity is not None:
+        unit, rest = _split_unit(rest)
+        paren = _PAREN_RE.match(rest)
+        if paren:  # "1 cup (250 ml) milk"
+            notes.append(paren.group(1))
+            rest = rest[paren.end():]
+    rest = re.sub(r"^of\s+", "", rest)
+
+    name, _, note = rest.partition(",")
+    if note.strip():
+        notes.append(note.strip())
+    # "1 can", "2 tablespoons": nothing but the unit, which is then the best name there is
+    name = name.strip() or unit or text
+    return {
+        "name": name,
+        "quantity": round(quantity, 2) if quantity is not None else None,
+        "unit": unit,
+        "note": "; ".join(notes) or None,
+    }
+
+
+def _servings(yields: str | None) -> int | None:
+    found = re.search(r"\d+", yields or "")
+    return int(found.group()) if found else None
+
+
+def parse_import(row: dict) -> dict:
+    """
+    Turns one pending_imports row into the recipe payload finish_pending_imports
+    expects (with a fresh recipe id). Raises ImportFailed when it can't.
+    """
+    raw = row.get("raw_data")
+    if not raw:
+        raise ImportFailed("no JSON-LD data")
+    if isinstance(raw, list):
+        raw = {"@graph": raw}
+    if isinstance(raw, dict) and "@context" not in raw:
+        # Extensions often store the bare Recipe object; the parser wants a schema.org context
+        raw = {"@context": "https://schema.org", **raw}
+    source_url = row.get("source_url") or ""
+    html = f'<script type="application/ld+json">{json.dumps(raw)}</script>'
+    try:
+        scraper = scrape_html(html, org_url=source_url or "https://example.invalid/", supported_only=False)
+        title = scraper.title()
+        lines = scraper.ingredients()
+    except Exception as e:
+        raise ImportFailed(f"not a schema.org Recipe: {e}") from e
+    if not title or not lines:
+        raise ImportFailed("recipe has no title or no ingredients")
+
+    def optional(getter):
+        try:
+            return getter() or None
+        except Exception:
+            return None
+
+    steps = optional(scraper.instructions_list) or []
+    return {
+        "import_id": row["id"],
+        "id": str(uuid.uuid4()),
+        "title": title.strip(),
+        "source_url": source_url or None,
+        "image_url": optional(scraper.image),
+        "instructions": "\n\n".join(steps) or None,
+        "servings": _servings(optional(scraper.yields)),
+        "created_by": row.get("user_id"),
+        "ingredients": [parse_ingredient_line(line) for line in lines if line and line.strip()],
+    }
+
+
+def claim_imports(sb, limit: int = 50) -> list:
+    """Claims up to limit queued rows for this worker (FOR UPDATE SKIP LOCKED on the server)."""
+    return sb.rpc("claim_pending_imports", {"p_limit": limit}).execute().data or []
+
+
+def exhausted_failure(row: dict, max_attempts: int) -> dict | None:
+    """
+    The failure to record for a claimed row that has already been claimed
+    max_attempts times without a result (each time the worker died or the
+    batch write failed), or None while it still has attempts left.
+    """
+    tries = (row.get("attempts") or 0) - 1  # this claim is not an attempt yet
+    if tries < max_attempts:
+        return None
+    last = row.get("error") or "the worker stopped before recording a result"
+    return {"import_id": row["id"], "error": f"gave up after {tries} attempts; last error: {last}"[:500]}
+
+
+def note_import_error(sb, import_ids: list, error: str) -> None:
+    """Stores error on claimed rows a batch couldn't finish, so exhausted_failure() can report it."""
+    if import_ids:
+        sb.table("pending_imports").update({"error": error[:500]}).in_("id", import_ids).execute()
+
+
+def finish_imports(sb, recipes: list, failures: list) -> list:
+    """
+    Writes a batch's recipes, ingredients and statuses in one transaction.
+    If the database rejects the batch, retries recipe by recipe so one bad row
+    fails alone; returns the failures added that way as {import_id, error}.
+    Network errors propagate, leaving the rows to be reclaimed later.
+    """
+    try:
+        sb.rpc("finish_pending_imports", {"p_recipes": recipes, "p_failures": failures}).execute()
+        return []
+    except APIError:
+        if not recipes:
+            raise
+
+    rejected = []
+    for recipe in recipes:
+        try:
+            sb.rpc("finish_pending_imports", {"p_recipes": [recipe], "p_failures": []}).execute()
+        except APIError as e:
+            rejected.append({"import_id": recipe["import_id"], "error": f"insert failed: {e.message}"[:500]})
+    sb.rpc("finish_pending_imports", {"p_recipes": [], "p_failures": failures + rejected}).execute()
+    return rejected
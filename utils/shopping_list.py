@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+"""
+Shopping list generation from meal plans.
+
+A plan's uncooked meals are expanded into their recipe ingredients, scaled
+by each meal's servings, converted to base units (utils.units), summed per
+line (normalized ingredient name + base unit) and reduced by what the pantry
+already holds. Lines are written with one bulk upsert; lines that drop to
+zero are deleted.
+
+The expanded plan is kept in memory per meal plan, so after the first full
+generation a change to one planned meal or one pantry item re-matches and
+rewrites only the lines it touches:
+
+    generate_shopping_list(hh_id, plan_id)                    # full build
+    refresh_for_meal(hh_id, plan_id, meal_plan_recipe_id)     # meal added/edited/removed
+    refresh_for_pantry(hh_id, ["Goat Milk"], [item_id])       # pantry item added/edited/removed
+
+Pantry stock is shared out between lines: when "milk" and "whole milk" both
+match the pantry's Milk, what one line takes is no longer there for the
+other. A pantry item stocked in a unit the line can't convert to (count vs
+cups) covers nothing, so the line stays on the list.
+"""
+
+import threading
+from dataclasses import dataclass, field
+
+from utils.cache import TTLCache
+from utils.ingredient_matcher import (
+    get_substitution_index,
+    ingredient_name,
+    match_against_pantry,
+    match_many,
+    normalize_name,
+)
+from utils.pagination import iter_rows
+from utils.supabase_client import get_client
+from utils.units import from_base, parse_unit, to_base
+
+
+def line_key(name: str, unit: str | None) -> str:
+    """Line identity "<normalized name>|<base unit>", so cups and tbsp of one ingredient share a line."""
+    return f"{normalize_name(name)}|{parse_unit(unit).base}"
+
+
+@dataclass
+class Line:
+    name: str                      # display name, from the first recipe that used it
+    unit: str                      # display unit, from the first recipe that used it
+    base_unit: str
+    ingredient_type_id: str | None
+    stock: float = 0.0             # pantry quantity (base units) set aside for this line
+    item_id: str | None = None     # the pantry item the line matched, if any
+
+
+@dataclass
+class ShoppingPlan:
+    """
+    In-memory expansion of one meal plan.
+
+    contributions[meal_id][key] is how much of a line (in base units) one
+    planned meal needs, so removing or rescaling a meal only touches that
+    meal's own lines. Plans are shared by every session in the process;
+    hold lock while changing one.
+    """
+
+    household_id: str | None = None
+    lines: dict[str, Line] = field(default_factory=dict)
+    contributions: dict[str, dict[str, float]] = field(default_factory=dict)
+    required: dict[str, float] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def set_meal(self, meal_id: str, needs: dict[str, tuple[float, Line]]) -> set[str]:
+        """Replaces one meal's contributions. Returns the line keys whose totals changed."""
+        affected = self.remove_meal(meal_id)
+        self.contributions[meal_id] = {}
+        for key, (qty, line) in needs.items():
+            self.lines.setdefault(key, line)
+            self.contributions[meal_id][key] = qty
+            self.required[key] = self.required.get(key, 0.0) + qty
+            affected.add(key)
+        return affected
+
+    def remove_meal(self, meal_id: str) -> set[str]:
+        affected = set()
+        for key, qty in self.contributions.pop(meal_id, {}).items():
+            self.required[key] -= qty
+            if self.required[key] <= 1e-9:
+                del self.required[key]
+                del self.lines[key]
+            affected.add(key)
+        return affected
+
+    def needed(self, key: str) -> float:
+        line = self.lines.get(key)
+        if line is None or key not in self.required:
+            return 0.0
+        return max(self.required[key] - line.stock, 0.0)
+
+
+def _meal_needs(meal: dict, ingredients: list) -> dict[str, tuple[float, Line]]:
+    recipe_servings = (meal.get("recipes") or {}).get("servings") or 4
+    scale = (meal.get("servings") or recipe_servings) / max(recipe_servings, 1)
+    needs: dict[str, tuple[float, Line]] = {}
+    for ing in ingredients:
+        name = ingredient_name(ing)
+        if not name:
+            continue
+        unit = parse_unit(ing.get("unit"))
+        key = line_key(name, ing.get("unit"))
+        qty, _ = to_base((ing.get("quantity") or 1) * scale, ing.get("unit"))
+        prev = needs.get(key)
+        line = prev[1] if prev else Line(name.strip(), unit.name, unit.base, ing.get("ingredient_type_id"))
+        needs[key] = ((prev[0] if prev else 0.0) + qty, line)
+    return needs
+
+
+def _load_meals(meal_plan_id: str, meal_plan_recipe_id: str | None = None) -> list:
+    query = (
+        get_client()
+        .table("meal_plan_recipes")
+        .select("id, recipe_id, servings, cooked_at, recipes(servings)")
+        .eq("meal_plan_id", meal_plan_id)
+    )
+    if meal_plan_recipe_id is not None:
+        query = query.eq("id", meal_plan_recipe_id)
+    # Cooked meals were already deducted from the pantry
+    return [m for m in (query.execute().data or []) if not m.get("cooked_at")]
+
+
+def _load_ingredients(recipe_ids: list[str]) -> dict[str, list]:
+    if not recipe_ids:
+        return {}
+    sb = get_client()
+    rows = iter_rows(
+        lambda: sb.table("recipe_ingredients")
+        .select("id, recipe_id, ingredient_type_id, name, quantity, unit, ingredient_types(name)")
+        .in_("recipe_id", list(set(recipe_ids)))
+    )
+    by_recipe: dict[str, list] = {}
+    for row in rows:
+        by_recipe.setdefault(row["recipe_id"], []).append(row)
+    return by_recipe
+
+
+def _restock(plan: ShoppingPlan, keys: set[str], household_id: str, released=()) -> set[str]:
+    """
+    Re-matches the given lines against the current pantry, then re-shares
+    the stock of every pantry item they matched before or match now (plus
+    released, items of lines that were dropped) between all lines on that
+    item, in line-key order. Returns the keys whose stock changed.
+    """
+    keys = sorted(k for k in keys if k in plan.lines)
+    items = {plan.lines[k].item_id for k in keys} | set(released)
+    if not keys and not items - {None}:
+        return set()
+    pantry, matches = match_against_pantry([plan.lines[k].name for k in keys], household_id)
+    for key, match in zip(keys, matches):
+        plan.lines[key].item_id = pantry[match]["id"] if match is not None else None
+        items.add(plan.lines[key].item_id)
+    items.discard(None)
+
+    by_id = {row["id"]: row for row in pantry}
+    rematched = set(keys)
+    remaining: dict[str, float] = {}
+    changed = set()
+    for key in sorted(plan.lines):
+        line = plan.lines[key]
+        if key not in rematched and line.item_id not in items:
+            continue
+        item = by_id.get(line.item_id)
+        stock = 0.0
+        if item is not None and item["base_unit"] == line.base_unit:
+            left = remaining.setdefault(line.item_id, max(item["base_quantity"], 0.0))
+            stock = min(left, plan.required.get(key, 0.0))
+            remaining[line.item_id] = left - stock
+        if stock != line.stock:
+            line.stock = stock
+            changed.add(key)
+    return changed
+
+
+def _write_lines(plan: ShoppingPlan, keys: set[str], household_id: str, meal_plan_id: str) -> None:
+    """Upserts the lines still needed and deletes the rest, in at most two requests."""
+    upserts, cleared = [], []
+    for key in keys:
+        needed = plan.needed(key)
+        if needed > 0:
+            line = plan.lines[key]
+            upserts.append({
+                "household_id": household_id,
+                "meal_plan_id": meal_plan_id,
+                "line_key": key,
+                "ingredient_type_id": line.ingredient_type_id,
+                "specific_name": line.name,
+                "quantity_needed": round(from_base(needed, line.unit), 2),
+                "unit": line.unit,
+            })
+        else:
+            cleared.append(key)
+
+    sb = get_client()
+    if upserts:
+        sb.table("shopping_list_items").upsert(upserts, on_conflict="meal_plan_id,line_key").execute()
+    if cleared:
+        (
+            sb.table("shopping_list_items")
+            .delete()
+            .eq("meal_plan_id", meal_plan_id)
+            .in_("line_key", cleared)
+            .execute()
+        )
+
+
+_plans = TTLCache(ttl=3600, max_entries=256)
+
+
+def generate_shopping_list(household_id: str, meal_plan_id: str) -> ShoppingPlan:
+    """Builds the whole list for a meal plan from scratch and writes every line."""
+    meals = _load_meals(meal_plan_id)
+    ingredients = _load_ingredients([m["recipe_id"] for m in meals])
+
+    plan = ShoppingPlan(household_id)
+    for meal in meals:
+        plan.set_meal(meal["id"], _meal_needs(meal, ingredients.get(meal["recipe_id"], [])))
+    _restock(plan, set(plan.lines), household_id)
+
+    existing = (
+        get_client()
+        .table("shopping_list_items")
+        .select("line_key")
+        .eq("meal_plan_id", meal_plan_id)
+        .not_.is_("line_key", "null")
+        .execute()
+    ).data or []
+    stale = {row["line_key"] for row in existing} - set(plan.required)
+
+    _write_lines(plan, set(plan.required) | stale, household_id, meal_plan_id)
+    _plans.put(meal_plan_id, plan)
+    return plan
+
+
+def _cached_plan(household_id: str, meal_plan_id: str) -> ShoppingPlan:
+    """The cached plan, after a full build if nothing was cached."""
+    plan = _plans.get(meal_plan_id)
+    if plan is None:
+        plan = generate_shopping_list(household_id, meal_plan_id)
+    return plan
+
+
+def refresh_for_meal(household_id: str, meal_plan_id: str, meal_plan_recipe_id: str) -> None:
+    """
+    Recomputes only the lines of one planned meal after it was added, had its
+    servings changed, was marked cooked, or was removed.
+    """
+    plan = _cached_plan(household_id, meal_plan_id)
+    meals = _load_meals(meal_plan_id, meal_plan_recipe_id)
+    ingredients = _load_ingredients([meals[0]["recipe_id"]]) if meals else {}
+
+    with plan.lock:
+        # Stock the meal's lines held goes back to whichever lines share their items
+        meal_keys = plan.contributions.get(meal_plan_recipe_id, {})
+        released = {plan.lines[k].item_id for k in meal_keys if k in plan.lines}
+        if meals:
+            meal = meals[0]
+            affected = plan.set_meal(meal["id"], _meal_needs(meal, ingredients.get(meal["recipe_id"], [])))
+        else:
+            affected = plan.remove_meal(meal_plan_recipe_id)
+        affected |= _restock(plan, affected, household_id, released)
+        _write_lines(plan, affected, household_id, meal_plan_id)
+
+
+def refresh_for_pantry(
+    household_id: str, names: list[str] = (), item_ids: list[str] = (), meal_plan_id: str | None = None
+) -> None:
+    """
+    Recomputes only the lines a pantry write touched: lines matched to one of
+    item_ids (edited, used up or removed items) and lines that could match
+    one of names (added or renamed items). With no meal_plan_id, does this
+    for every plan of the household cached here; plans nobody has generated
+    since the server started are left for their next full build.
+    """
+    names = [name for name in names if name]
+    item_ids = set(item_ids)
+    if not names and not item_ids:
+        return
+    if meal_plan_id is None:
+        plans = [(pid, plan) for pid, plan in _plans.items() if plan.household_id == household_id]
+    else:
+        plans = [(meal_plan_id, _cached_plan(household_id, meal_plan_id))]
+
+    subs = get_substitution_index(household_id) if names else None
+    for plan_id, plan in plans:
+        with plan.lock:
+            keys = [k for k, line in plan.lines.items() if line.item_id in item_ids]
+            line_keys = list(plan.lines)
+            line_names = [plan.lines[k].name for k in line_keys]
+            for name in names:
+                matches = match_many(line_names, [name], subs)
+                keys += [k for k, m in zip(line_keys, matches) if m is not None]
+            changed = _restock(plan, set(keys), household_id)
+            if changed:
+                _write_lines(plan, changed, household_id, plan_id)
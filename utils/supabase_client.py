@@ -1,15 +1,80 @@
 import os
 import json
+import logging
+import time
+import httpx
 import streamlit as st
 import streamlit.components.v1 as _components
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
+from utils import query_log
+from utils.cache import TTLCache
 
 load_dotenv()
 
 _SUPABASE_URL = os.getenv("SUPABASE_URL")
 _SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
 
+# Shared connection pool for every Supabase request (see _http_client()).
+_HTTP_POOL_SIZE = int(os.getenv("SUPABASE_HTTP_POOL_SIZE", "20"))
+_HTTP_KEEPALIVE_SECONDS = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_SECONDS", "60"))
+_HTTP_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_HTTP_TIMEOUT_SECONDS", "10"))
+_HTTP_RETRIES = int(os.getenv("SUPABASE_HTTP_RETRIES", "3"))
+_HTTP_BACKOFF_SECONDS = float(os.getenv("SUPABASE_HTTP_BACKOFF_SECONDS", "0.25"))
+
+logger = logging.getLogger("smartpantry.auth")
+
+# Access tokens are refreshed this long before they expire (see persist_auth()).
+_REFRESH_MARGIN_SECONDS = float(os.getenv("SUPABASE_REFRESH_MARGIN_SECONDS", "120"))
+
+# user id -> household. Shared across sessions so a browser refresh or a
+# second tab doesn't repeat the lookup; create/join invalidate it. "No
+# household" is never cached, so one created or joined from the web app or
+# another tab shows up on the next load instead of after the TTL.
+_households = TTLCache(ttl=300, max_entries=10_000)
+
+_RETRY_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class _RetryTransport(httpx.HTTPTransport):
+    """Pooled transport that backs off and retries idempotent requests on 429/5xx.
+
+    Connection failures are already retried by httpx (retries=); non-idempotent
+    requests (POST/PATCH) are never replayed after the server has answered.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = super().handle_request(request)
+            if (
+                request.method not in _RETRY_METHODS
+                or response.status_code not in _RETRY_STATUSES
+                or attempt >= _HTTP_RETRIES
+            ):
+                return response
+            response.close()
+            time.sleep(_HTTP_BACKOFF_SECONDS * 2 ** attempt)
+            attempt += 1
+
+
+@st.cache_resource
+def _http_client() -> httpx.Client:
+    """One keep-alive connection pool shared by supabase-py and the raw REST helpers,
+    so a page render that makes several queries reuses warm TLS connections."""
+    limits = httpx.Limits(
+        max_connections=_HTTP_POOL_SIZE,
+        max_keepalive_connections=_HTTP_POOL_SIZE,
+        keepalive_expiry=_HTTP_KEEPALIVE_SECONDS,
+    )
+    return httpx.Client(
+        transport=_RetryTransport(limits=limits, retries=_HTTP_RETRIES),
+        timeout=_HTTP_TIMEOUT_SECONDS,
+        follow_redirects=True,
+    )
+
 
 @st.cache_resource
 def _base_client() -> Client:
@@ -17,15 +82,18 @@ def _base_client() -> Client:
     if not _SUPABASE_URL or not _SUPABASE_KEY:
         st.error("Missing SUPABASE_URL or SUPABASE_ANON_KEY. Check your .env file.")
         st.stop()
-    return create_client(_SUPABASE_URL, _SUPABASE_KEY)
+    return create_client(_SUPABASE_URL, _SUPABASE_KEY, options=SyncClientOptions(httpx_client=_http_client()))
 
 
 class _AuthClient:
-    """Wraps a Supabase client and injects the user's JWT into every table() call.
+    """Wraps a Supabase client and injects the user's JWT into every table() and rpc() call.
 
     supabase-py 2.x does not reliably propagate auth state to PostgREST when
     set on the shared client object. Chaining .auth(token) per request is the
     only approach that works consistently (per supabase-py issue #272/#915).
+
+    When query logging is on (see utils/query_log.py) the builders come back
+    wrapped so every execute() is recorded.
     """
 
     def __init__(self, sb, token):
@@ -38,6 +106,18 @@ class _AuthClient:
             # builder.auth is a BasicAuth field (None by default), NOT a method.
             # Inject the user JWT directly into the builder's request headers.
             builder.headers["Authorization"] = f"Bearer {self._token}"
+        if query_log.is_enabled():
+            return query_log.InstrumentedQuery(builder, name)
+        return builder
+
+    def rpc(self, fn, params=None, **kwargs):
+        builder = self._sb.rpc(fn, params or {}, **kwargs)
+        if self._token:
+            # RPC builders keep their headers on the request config in postgrest >= 1.0
+            headers = builder.request.headers if hasattr(builder, "request") else builder.headers
+            headers["Authorization"] = f"Bearer {self._token}"
+        if query_log.is_enabled():
+            return query_log.InstrumentedQuery(builder, fn, "rpc")
         return builder
 
     def __getattr__(self, name):
@@ -54,6 +134,13 @@ def get_client():
     return _AuthClient(sb, token)
 
 
+def get_anon_client():
+    """Returns a client that carries no user's JWT, so it sees only what RLS
+    grants the anon role. Use it to fill caches shared by every user (e.g.
+    st.cache_resource), which must not depend on whose session loaded them."""
+    return _AuthClient(_base_client(), None)
+
+
 def get_session():
     return st.session_state.get("session")
 
@@ -101,68 +188,85 @@ def sign_out():
 def _create_household(name: str, user_id: str, sb):
     """Create a household via direct REST calls.
 
-    Uses requests instead of supabase-py to reliably send the user JWT.
-    The table requires GRANT + RLS (authenticated role), both set in migrations.
+    Goes around supabase-py (over the same pooled HTTP client) to reliably
+    send the user JWT. The table requires GRANT + RLS (authenticated role),
+    both set in migrations.
     """
-    import requests as _req
+    http = _http_client()
 
     session = st.session_state.get("session")
     if not session:
         st.error("Cannot create household: no active session.")
         return
+    try:
+        headers = {
+            "apikey": _SUPABASE_KEY,
+            "Authorization": f"Bearer {session.access_token}",
+            "Content-Type": "application/json",
+            "Prefer": "return=representation",
+        }
+
+        resp = http.post(
+            f"{_SUPABASE_URL}/rest/v1/households",
+            json={"name": name},
+            headers=headers,
+        )
+        if not resp.is_success:
+            st.error(f"Could not create household: {resp.status_code} {resp.text}")
+            return
 
-    headers = {
-        "apikey": _SUPABASE_KEY,
-        "Authorization": f"Bearer {session.access_token}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation",
-    }
-
-    resp = _req.post(
-        f"{_SUPABASE_URL}/rest/v1/households",
-        json={"name": name},
-        headers=headers,
-    )
-    if not resp.ok:
-        st.error(f"Could not create household: {resp.status_code} {resp.text}")
-        return
-
-    hh_id = resp.json()[0]["id"]
+        hh_id = resp.json()[0]["id"]
 
-    resp2 = _req.post(
-        f"{_SUPABASE_URL}/rest/v1/household_members",
-        json={"user_id": user_id, "household_id": hh_id, "role": "owner"},
-        headers=headers,
+        resp2 = http.post(
+            f"{_SUPABASE_URL}/rest/v1/household_members",
+            json={"user_id": user_id, "household_id": hh_id, "role": "owner"},
+            headers=headers,
+        )
+        if not resp2.is_success:
+            st.error(f"Could not add household member: {resp2.status_code} {resp2.text}")
+    finally:
+        # Even a failed request may have gone through (e.g. a timeout after commit)
+        _households.invalidate(user_id)
+
+
+def _load_household(sb, user_id: str):
+    result = (
+        sb.table("household_members")
+        .select("household_id, role, households(id, name, invite_code)")
+        .eq("user_id", user_id)
+        .limit(1)
+        .execute()
     )
-    if not resp2.ok:
-        st.error(f"Could not add household member: {resp2.status_code} {resp2.text}")
+    if result.data:
+        row = result.data[0]
+        hh = row["households"]
+        hh["role"] = row["role"]
+        return hh
+    return None
 
 
 def get_household():
-    """Returns the current user's household, or None if not in one."""
+    """Returns the current user's household, or None if not in one. Cached per user once found."""
     session = get_session()
     if not session:
         return None
     try:
-        sb = get_client()
-        result = (
-            sb.table("household_members")
-            .select("household_id, role, households(id, name, invite_code)")
-            .eq("user_id", session.user.id)
-            .limit(1)
-            .execute()
-        )
-        if result.data:
-            row = result.data[0]
-            hh = row["households"]
-            hh["role"] = row["role"]
-            return hh
-        return None
+        household = _households.get(session.user.id)
+        if household is None:
+            household = _load_household(get_client(), session.user.id)
+            if household is not None:
+                _households.put(session.user.id, household)
+        return household
     except Exception as e:
         st.error(f"Could not load household: {e}")
         return None
 
 
+def clear_household_cache(user_id: str) -> None:
+    """Forgets a user's cached household. Call after they create, join or leave one."""
+    _households.invalidate(user_id)
+
+
 def join_household(invite_code: str) -> bool:
     """Adds the current user to a household via invite code."""
     session = get_session()
@@ -184,6 +288,10 @@ def join_household(invite_code: str) -> bool:
     except Exception as e:
         st.error(f"Could not join household: {e}")
         return False
+    finally:
+        # A failed insert (e.g. already a member via another tab) still means
+        # the cached answer may be stale
+        _households.invalidate(session.user.id)
 
 
 # ── Session persistence via localStorage ──────────────────────
@@ -191,23 +299,55 @@ def join_household(invite_code: str) -> bool:
 _LS_KEY = "sp_session"
 
 
+_PERSISTED_KEY = "_persisted_tokens"
+
+
+def _refresh_if_expiring(session):
+    """Swaps in a refreshed session when the access token expires within the margin."""
+    if not session.expires_at or session.expires_at - time.time() > _REFRESH_MARGIN_SECONDS:
+        return session
+    try:
+        refreshed = _base_client().auth.refresh_session(session.refresh_token).session
+    except Exception as e:
+        # Keep the current tokens; the next render tries again
+        logger.warning("session refresh failed: %s", e)
+        return session
+    if refreshed:
+        st.session_state.session = refreshed
+        return refreshed
+    return session
+
+
 def persist_auth():
     """
-    Saves the current session's tokens to localStorage so the session survives
-    browser refreshes and Streamlit restarts. Call this on every authenticated page.
+    Keeps the session's tokens fresh and saved in localStorage, so the session
+    survives browser refreshes and Streamlit restarts. Call this on every
+    authenticated page.
+
+    The access token is refreshed shortly before it expires, and the
+    localStorage write (an iframe) is only mounted when the tokens changed
+    since the last write from this session, so a steady-state rerun costs
+    no network call and no iframe. Returns the (possibly refreshed) session.
     """
     session = get_session()
     if not session:
-        return
+        return None
+    session = _refresh_if_expiring(session)
+    tokens = (session.access_token, session.refresh_token)
+    if st.session_state.get(_PERSISTED_KEY) == tokens:
+        return session
     data = json.dumps({"at": session.access_token, "rt": session.refresh_token})
     _components.html(
         f"<script>try{{window.parent.localStorage.setItem({json.dumps(_LS_KEY)},{json.dumps(data)})}}catch(e){{}}</script>",
         height=0,
     )
+    st.session_state[_PERSISTED_KEY] = tokens
+    return session
 
 
 def clear_persisted_auth():
     """Removes saved tokens from localStorage. Call on sign-out."""
+    st.session_state.pop(_PERSISTED_KEY, None)
     _components.html(
         f"<script>try{{window.parent.localStorage.removeItem({json.dumps(_LS_KEY)})}}catch(e){{}}</script>",
         height=0,
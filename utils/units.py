@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+"""
+Unit parsing and conversion.
+
+Free-text units ("Tablespoons", "tbsp.", "T", "fl. oz") are parsed once into
+a Unit: a canonical spelling, a dimension and a factor to that dimension's
+base unit (ml for volume, g for mass, count for countables). Pantry rows and
+recipe ingredients are converted to base units when they are loaded or
+written, so deduction and shopping-list totals are plain float arithmetic
+and two quantities can only be combined when their base units agree.
+
+Volume and mass don't convert into each other (that needs a density), and
+units with no conversion ("pinch", "clove") are their own base unit, so they
+only ever combine with the same unit. Those in _TABLE also match their
+plural spellings; anything else is kept exactly as written.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+BASE_UNITS = {"volume": "ml", "mass": "g", "count": "count"}
+
+
+@dataclass(frozen=True)
+class Unit:
+    name: str       # canonical spelling, e.g. "tbsp"
+    dimension: str  # "volume", "mass", "count", or "other"
+    factor: float   # base units in one of this unit
+    base: str       # "ml", "g", "count", or the unit's own name for "other"
+
+
+# canonical name: (dimension, base units per unit, spellings). Plurals are
+# listed rather than derived: stripping a trailing "s" turns "glasses" into
+# "glasse" and "leaves" into "leave".
+_TABLE = {
+    "ml":     ("volume", 1.0, ("milliliter", "millilitre", "milliliters", "millilitres", "mL", "mls", "cc")),
+    "l":      ("volume", 1000.0, ("liter", "litre", "liters", "litres", "ltr", "ltrs")),
+    "tsp":    ("volume", 4.92892, ("teaspoon", "teaspoons", "tsps", "t")),
+    "tbsp":   ("volume", 14.7868, ("tablespoon", "tablespoons", "tbs", "tbl", "tbls", "tbsps", "T")),
+    "fl oz":  ("volume", 29.5735, ("fluid ounce", "fluid ounces", "fl. oz", "floz", "fl ounce", "fl ounces")),
+    "cup":    ("volume", 236.588, ("c", "cups")),
+    "pint":   ("volume", 473.176, ("pints", "pt", "pts")),
+    "quart":  ("volume", 946.353, ("quarts", "qt", "qts")),
+    "gallon": ("volume", 3785.41, ("gallons", "gal", "gals")),
+    "mg":     ("mass", 0.001, ("milligram", "milligrams", "mgs")),
+    "g":      ("mass", 1.0, ("gram", "grams", "gr", "grm", "grms")),
+    "kg":     ("mass", 1000.0, ("kilogram", "kilograms", "kilo", "kilos", "kgs")),
+    "oz":     ("mass", 28.3495, ("ounce", "ounces", "ozs")),
+    "lb":     ("mass", 453.592, ("pound", "pounds", "lbs")),
+    "count":  ("count", 1.0, (
+        "each", "ea", "piece", "pieces", "pc", "pcs", "ct", "cts",
+        "whole", "item", "items", "unit", "units", "",
+    )),
+    "dozen":  ("count", 12.0, ("dozens", "doz")),
+    # Units with no conversion, each its own base; listed so plurals aggregate
+    "can":     ("other", 1.0, ("cans",)),
+    "clove":   ("other", 1.0, ("cloves",)),
+    "pinch":   ("other", 1.0, ("pinches",)),
+    "dash":    ("other", 1.0, ("dashes",)),
+    "slice":   ("other", 1.0, ("slices",)),
+    "package": ("other", 1.0, ("packages",)),
+    "pkg":     ("other", 1.0, ("pkgs",)),
+    "stick":   ("other", 1.0, ("sticks",)),
+    "bunch":   ("other", 1.0, ("bunches",)),
+    "sprig":   ("other", 1.0, ("sprigs",)),
+    "handful": ("other", 1.0, ("handfuls",)),
+    "head":    ("other", 1.0, ("heads",)),
+    "jar":     ("other", 1.0, ("jars",)),
+    "bottle":  ("other", 1.0, ("bottles",)),
+    "bag":     ("other", 1.0, ("bags",)),
+    "box":     ("other", 1.0, ("boxes",)),
+    "sheet":   ("other", 1.0, ("sheets",)),
+    "drop":    ("other", 1.0, ("drops",)),
+    "leaf":    ("other", 1.0, ("leaves",)),
+    "glass":   ("other", 1.0, ("glasses",)),
+    "stalk":   ("other", 1.0, ("stalks",)),
+    "loaf":    ("other", 1.0, ("loaves",)),
+}
+
+# Case matters only for these (T = tablespoon, t = teaspoon); everything else is lowercased.
+_CASE_SENSITIVE = {"T": "tbsp", "t": "tsp"}
+
+_ALIASES: dict[str, Unit] = {}
+for _name, (_dimension, _factor, _spellings) in _TABLE.items():
+    _unit = Unit(_name, _dimension, _factor, BASE_UNITS.get(_dimension, _name))
+    for _spelling in (_name, *_spellings):
+        if _spelling not in _CASE_SENSITIVE:
+            _ALIASES[_spelling.lower()] = _unit
+
+_CLEAN_RE = re.compile(r"[.\s]+")
+
+
+@lru_cache(maxsize=4096)
+def parse_unit(text: str | None) -> Unit:
+    """Parses a free-text unit. Missing units are counts; unknown ones are kept as-is."""
+    raw = (text or "").strip().rstrip(".")
+    if raw in _CASE_SENSITIVE:
+        return _ALIASES[_CASE_SENSITIVE[raw]]
+    cleaned = _CLEAN_RE.sub(" ", raw.lower()).strip()
+    return _ALIASES.get(cleaned) or Unit(cleaned, "other", 1.0, cleaned)
+
+
+def canonical_unit(text: str | None) -> str:
+    """The canonical spelling to store for a unit, e.g. "Tablespoons" -> "tbsp"."""
+    return parse_unit(text).name
+
+
+def to_base(quantity: float, unit: str | None) -> tuple[float, str]:
+    """Converts a quantity to its base unit, e.g. (2, "cups") -> (473.176, "ml")."""
+    parsed = parse_unit(unit)
+    return quantity * parsed.factor, parsed.base
+
+
+def from_base(quantity: float, unit: str | None) -> float:
+    """Converts a base-unit quantity back into unit, e.g. (473.176, "cups") -> 2."""
+    return quantity / parse_unit(unit).factor
+
+
+def convert(quantity: float, from_unit: str | None, to_unit: str | None) -> float | None:
+    """Converts between two units, or returns None when their dimensions differ."""
+    source, target = parse_unit(from_unit), parse_unit(to_unit)
+    if source.base != target.base:
+        return None
+    return quantity * source.factor / target.factor